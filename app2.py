@@ -1,48 +1,108 @@
 import sys
 import os
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import numpy as np
-from datetime import datetime, timedelta
+import math
+import time
+from datetime import datetime
 # ✅ Add absolute path of your project directory to sys.path
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
 from driver_service.auth import create_service
 from driver_service.driver_manager import DriveManager
+from driver_service.ohlcv_store import OHLCVStore
+from driver_service.drive_cache import DriveCache, DriveMetadataCache
+from driver_service.schema import conform
+from driver_service.cube import build_cube, rollup
+from driver_service.charts import candlestick_figure, payload_sizes, MAX_BARS
+from driver_service.screener_archive import ScreenerArchive
+from driver_service.job_runner import RefreshJob
+from driver_service.constant import PANEL_CSV_DTYPES, DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_BYTES, DRIVE_METADATA_PATH, DASHBOARD_OHLCV_STORE_DIR, DASHBOARD_SCREENER_ARCHIVE_DIR, REFRESH_JOB_DIR, RETENTION_DAYS
 
-import subprocess
 
 
 
 # ---------- Data Preparation ----------
-@st.cache_data
-def load_data():
+@st.cache_resource
+def drive():
     CLIENT_SECRET_FILE = os.path.join(project_root, "config", "client_secret.json")
     API_NAME = 'drive'
     API_VERSION = 'v3'
     SCOPES = ['https://www.googleapis.com/auth/drive']
 
-    drive_service = create_service(CLIENT_SECRET_FILE, API_NAME, API_VERSION, SCOPES)
-    manager = DriveManager(drive_service)
-
-    folder_id = manager.get_or_create_folder("bhavcopy_stock_data")
-    df_final = manager.fetch_csv_by_name_as_dataframe("complete_data1.csv", folder_id)
+    # Shared by every session thread, so each request gets its own HTTP connection.
+    drive_service = create_service(CLIENT_SECRET_FILE, API_NAME, API_VERSION, SCOPES, thread_safe=True)
+    manager = DriveManager(drive_service, cache=DriveCache(DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_BYTES),
+                           metadata=DriveMetadataCache(DRIVE_METADATA_PATH))
+    folders = manager.get_or_create_folders(["bhavcopy_stock_data", "vcp_folder"])
+    return manager, folders
 
-    folder_id_vcp = manager.get_or_create_folder("vcp_folder")
-    vcp = manager.fetch_csv_by_name_as_dataframe(f'{(datetime.today()-timedelta(0)).strftime("%d%m%Y")}.csv', folder_id_vcp)
 
+# Panel and screeners are cached separately so a refresh only reloads what it changed.
+@st.cache_data
+def load_panel():
+    manager, folders = drive()
+    columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'NSE_BSE_code', 'Category',
+               'Industry', 'Mapped Sector', "market", "Sub Industry"]
+    store = OHLCVStore(DASHBOARD_OHLCV_STORE_DIR)
+    folder_id = folders["bhavcopy_stock_data"]
+    store.register(manager.download_partitions(folder_id, store.root, store.partitions))
+    if store.is_empty():
+        df_final = manager.fetch_csv_by_name_as_dataframe("complete_data1.csv", folder_id,
+                                                          usecols=['datetime'] + columns[1:], dtype=PANEL_CSV_DTYPES)
+        df_final = conform(df_final)[columns]
+    else:
+        # Compacted months straddling the retention cutoff are kept whole; trim them here.
+        df_final = store.read(columns=columns, start=store.retention_cutoff(RETENTION_DAYS))
 
+    df_final = df_final[df_final["Industry"] != "BhaPra"]
 
+    print("Drive cache:", manager.cache.stats())
+    # Charts only ever need OHLCV per (dimensions, date); pre-aggregate once per load
+    # so filter changes slice this cube instead of re-grouping every raw row.
+    # The load time stamps the memoized figures built from this cube.
+    return build_cube(df_final), datetime.now().isoformat()
 
-    df_final[['date', 'time']] = df_final['datetime'].str.split('T', expand=True)
-    df_final = df_final[['date', 'open', 'high', 'low', 'close', 'volume', 'NSE_BSE_code', 'Category',
-                         'Industry', 'Mapped Sector', "market", "Sub Industry"]]
-    df_final = df_final[df_final["Industry"] != "BhaPra"]
-    df_final['date'] = pd.to_datetime(df_final['date'])
 
-    return df_final , vcp
+@st.cache_data
+def load_vcp():
+    manager, folders = drive()
+    folder_id_vcp = folders["vcp_folder"]
+    screeners = ScreenerArchive(DASHBOARD_SCREENER_ARCHIVE_DIR)
+    screeners.register(manager.download_partitions(folder_id_vcp, screeners.root, screeners.partitions))
+    if screeners.is_empty():
+        screeners.backfill(manager, folder_id_vcp)
+    # Latest archived day (not necessarily today), with how long and how widely each symbol has screened
+    vcp = screeners.latest()
+    weekly = screeners.symbols_on_screens(min_screens=1).set_index('Symbol')['screens']
+    vcp['first_seen'] = vcp['Symbol'].map(screeners.first_appearance(vcp['Symbol'].unique()))
+    vcp['screens_this_week'] = vcp['Symbol'].map(weekly).fillna(0).astype(int)
+    return vcp
+
+
+@st.cache_resource
+def refresh_watch():
+    # Process-wide: when this server started and which finished refresh jobs it has
+    # already reloaded for, so each job clears the caches once, not once per session.
+    return {'since': datetime.now().isoformat(timespec='seconds'), 'handled': set()}
+
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def chart_figure(keys, filter_state, agg_method, default_zoom_days, max_bars, sector_name, _agg_df):
+    # Memoized per (group key, filter state, agg method, zoom, bar budget): paging back
+    # or toggling volume reuses the figure. Always carries the volume trace as data[1];
+    # returned with its payload sizes, measured here once per figure.
+    title_text = (
+        f"<b>Industry:</b> {keys[0]}<br>"
+        f"<b>Sector:</b> {sector_name}"
+    ) if len(keys) == 1 else (
+        f"<b>Sub Industry:</b> {keys[1]}<br>"
+        f"<b>Industry:</b> {keys[0]}<br>"
+        f"<b>Sector:</b> {sector_name}"
+    )
+    fig = candlestick_figure(_agg_df, title_text, default_zoom_days, max_bars=max_bars,
+                             pad_days=pad_days, right_padding_days=right_padding_days)
+    return fig, payload_sizes(fig)
 
 # ---------- Streamlit UI ----------
 st.set_page_config(layout="wide")
@@ -50,18 +110,55 @@ st.title("📊 Industry/Sub-Industry Stock Index (Candlestick + Volume)")
 
 st.title("🔘 Run Vcp and NSE BSE Data Pushing to Drive Script on Button Click")
 
+refresh_job = RefreshJob(REFRESH_JOB_DIR)
 if st.button("🚀 Refresh Data "):
-    with st.spinner("Running your script..."):
-        try:
-            result = subprocess.run(["python", "server.py"], check=True, capture_output=True, text=True)
-            st.code(result.stdout)  # Optionally show output
-            st.success("✅ Script executed successfully!")
-        except subprocess.CalledProcessError as e:
-            st.error("❌ Script failed to run.")
-            st.code(e.stderr)
+    # Runs in the background; everyone's dashboard stays usable and a second click
+    # while a refresh is running just shows that one's progress.
+    if refresh_job.start([sys.executable, os.path.join(project_root, "server.py")]) is None:
+        st.info("⏳ A refresh is already running, showing its progress.")
+
+
+refresh_polling = refresh_job.is_running()
+
+
+@st.fragment(run_every=2 if refresh_polling else None)
+def refresh_progress():
+    status = refresh_job.status()
+    if status is None:
+        return
+    if status['state'] == 'running':
+        st.progress(refresh_job.progress(status), text=f"🔄 Refreshing: {status['stage'] or 'starting'}")
+        st.code(refresh_job.log_tail(15))
+        return
+
+    watch = refresh_watch()
+    if status['job_id'] not in watch['handled']:
+        watch['handled'].add(status['job_id'])
+        # Jobs that finished before this server started left nothing cached to invalidate.
+        if (status['finished'] or '') >= watch['since']:
+            if 'panel' in status['updated']:
+                load_panel.clear()
+            if 'screeners' in status['updated']:
+                load_vcp.clear()
+    if refresh_polling:
+        # The job just ended: rerun the whole page on the reloaded data and stop polling.
+        st.rerun()
+
+    if status['state'] == 'succeeded':
+        st.success(f"✅ Data refreshed at {status['finished']} "
+                   f"({', '.join(status['updated']) or 'nothing new'})")
+    else:
+        st.error(f"❌ Refresh {status['state']} (started {status['started']}).")
+    with st.expander("Refresh log"):
+        st.code(refresh_job.log_tail())
+
+
+refresh_progress()
 
 cols_per_row = 3
+charts_per_page = st.selectbox("Charts per Page", [12, 24, 48, 96])
 show_volume = st.checkbox("Show Volume Bars", value=True)
+downsample_long = st.checkbox(f"Weekly bars for ranges over {MAX_BARS} days (lighter page)", value=False)
 agg_method = st.selectbox("Aggregation Method", ["sum", "mean", "weighted_avg"])
 default_zoom_days = st.slider("Default Zoom Window (Days from End)", 10, 180, 60)
 
@@ -77,151 +174,78 @@ if st.button("📂 Load & Generate Charts"):
     st.session_state.loaded = True
 
 if st.session_state.loaded:
+    run_started = time.perf_counter()
+    first_chart_s = None
     with st.spinner("🔄 Generating charts... please wait"):
-        df, vcp = load_data()
+        cube, data_stamp = load_panel()
+        vcp = load_vcp()
 
-        markets = sorted(df['market'].dropna().unique())
+        selection = cube
+        markets = sorted(selection['market'].dropna().unique())
         selected_market = st.selectbox("Select Market", ["All"] + markets)
         if selected_market != "All":
-            df = df[df['market'] == selected_market]
+            selection = selection[selection['market'] == selected_market]
 
-        sectors = sorted(df['Mapped Sector'].dropna().unique())
+        sectors = sorted(selection['Mapped Sector'].dropna().unique())
         selected_sector = st.selectbox("Select Sector", ["All"] + sectors)
         if selected_sector != "All":
-            df = df[df['Mapped Sector'] == selected_sector]
+            selection = selection[selection['Mapped Sector'] == selected_sector]
 
-        industries = sorted(df['Industry'].dropna().unique())
+        industries = sorted(selection['Industry'].dropna().unique())
         selected_industry = st.selectbox("Select Industry", ["All"] + industries)
         if selected_industry != "All":
-            df = df[df['Industry'] == selected_industry]
+            selection = selection[selection['Industry'] == selected_industry]
 
-        sub_industries = sorted(df['Sub Industry'].dropna().unique())
+        sub_industries = sorted(selection['Sub Industry'].dropna().unique())
         selected_sub_industry = st.selectbox("Select Sub Industry", ["All"] + sub_industries)
         if selected_sub_industry != "All":
-            df = df[df['Sub Industry'] == selected_sub_industry]
+            selection = selection[selection['Sub Industry'] == selected_sub_industry]
 
-        categories = sorted(df['Category'].dropna().unique())
+        categories = sorted(selection['Category'].dropna().unique())
         selected_category = st.selectbox("Select Market Cap Type (Category)", ["All"] + list(categories))
 
         start_date, end_date = st.date_input(
             "Select Date Range",
-            [df['date'].min(), df['date'].max()],
-            min_value=df['date'].min(),
-            max_value=df['date'].max()
+            [selection['date'].min(), selection['date'].max()],
+            min_value=selection['date'].min(),
+            max_value=selection['date'].max()
         )
 
-        if aggregation_level == "Sub Industry":
-            hierarchy_df = df[['Industry', 'Sub Industry']].drop_duplicates().dropna().sort_values(['Industry', 'Sub Industry'])
-        else:
-            hierarchy_df = df[['Industry']].drop_duplicates().dropna().sort_values(['Industry'])
-
-        row = []
-        col_count = 0
-
-        for _, row_info in hierarchy_df.iterrows():
-            if aggregation_level == "Sub Industry":
-                industry_name = row_info['Industry']
-                sub_industry_name = row_info['Sub Industry']
-                plot_df = df[(df['Industry'] == industry_name) & (df['Sub Industry'] == sub_industry_name)].copy()
-            else:
-                industry_name = row_info['Industry']
-                sub_industry_name = None
-                plot_df = df[df['Industry'] == industry_name].copy()
-
-            if selected_category != "All":
-                plot_df = plot_df[plot_df['Category'] == selected_category]
-
-            plot_df = plot_df[
-                (plot_df['date'] >= pd.Timestamp(start_date)) & (plot_df['date'] <= pd.Timestamp(end_date))
-            ]
-
-            if plot_df.empty:
-                continue
-
-            sector_name = plot_df['Mapped Sector'].iloc[0] if not plot_df['Mapped Sector'].isnull().all() else "Unknown"
-
-            if agg_method == 'sum':
-                agg_df = plot_df.groupby('date').agg({
-                    'open': 'sum', 'high': 'sum', 'low': 'sum', 'close': 'sum', 'volume': 'sum'
-                }).reset_index().sort_values('date')
-            elif agg_method == 'mean':
-                agg_df = plot_df.groupby('date').agg({
-                    'open': 'mean', 'high': 'mean', 'low': 'mean', 'close': 'mean', 'volume': 'sum'
-                }).reset_index().sort_values('date')
-            else:
-                weighted_sum = plot_df.groupby('date').apply(lambda g: pd.Series({
-                    'open': (g['open'] * g['volume']).sum() / g['volume'].sum(),
-                    'high': (g['high'] * g['volume']).sum() / g['volume'].sum(),
-                    'low': (g['low'] * g['volume']).sum() / g['volume'].sum(),
-                    'close': (g['close'] * g['volume']).sum() / g['volume'].sum(),
-                    'volume': g['volume'].sum()
-                })).reset_index().sort_values('date')
-                agg_df = weighted_sum
-
-            padding = pd.DataFrame({
-                'date': pd.date_range(start=agg_df['date'].min() - pd.Timedelta(days=pad_days), periods=pad_days),
-                'open': np.nan, 'high': np.nan, 'low': np.nan, 'close': np.nan, 'volume': 0
-            })
-            agg_df = pd.concat([padding, agg_df], ignore_index=True)
-
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(
-                x=agg_df['date'], open=agg_df['open'], high=agg_df['high'],
-                low=agg_df['low'], close=agg_df['close'],
-                name='Price', increasing_line_color='limegreen', decreasing_line_color='red'
-            ))
-
-            if show_volume:
-                fig.add_trace(go.Bar(
-                    x=agg_df['date'], y=agg_df['volume'], name='Volume',
-                    marker_color='rgba(135, 206, 250, 0.2)', yaxis='y2'
-                ))
-
-            zoom_start = agg_df['date'].max() - pd.Timedelta(days=default_zoom_days)
-            zoom_end = agg_df['date'].max() + pd.Timedelta(days=right_padding_days)
-
-            title_text = (
-                f"<b>Industry:</b> {industry_name}<br>"
-                f"<b>Sector:</b> {sector_name}"
-            ) if aggregation_level == "Industry" else (
-                f"<b>Sub Industry:</b> {sub_industry_name}<br>"
-                f"<b>Industry:</b> {industry_name}<br>"
-                f"<b>Sector:</b> {sector_name}"
-            )
-
-            fig.update_layout(
-                xaxis=dict(range=[zoom_start, zoom_end], autorange=False),
-                title={
-                    'text': title_text,
-                    'x': 0.5,
-                    'xanchor': 'center'
-                },
-                xaxis_title="Date",
-                yaxis_title="Price",
-                yaxis2=dict(overlaying='y', side='right', title='Volume', showgrid=False),
-                height=450,
-                margin=dict(t=100, b=20),
-                plot_bgcolor="#111",
-                paper_bgcolor="#111",
-                font=dict(color='white'),
-                xaxis_rangeslider_visible=False,
-                showlegend=False,
-            )
-
-            row.append(fig)
-            col_count += 1
-
-            if col_count == cols_per_row:
-                cols = st.columns(cols_per_row)
-                for i, col in enumerate(cols):
-                    col.plotly_chart(row[i], use_container_width=True)
-                row = []
-                col_count = 0
-
-        if row:
-            cols = st.columns(len(row))
-            for i, col in enumerate(cols):
-                col.plotly_chart(row[i], use_container_width=True)
+        group_cols = ['Industry', 'Sub Industry'] if aggregation_level == "Sub Industry" else ['Industry']
+        # One grouped sum over the cube gives every chart's OHLCV at once.
+        charts = rollup(selection, group_cols, agg_method, filters={'Category': selected_category},
+                        start=start_date, end=end_date)
+        sector_names = selection.dropna(subset=group_cols + ['Mapped Sector']).groupby(
+            group_cols, observed=True)['Mapped Sector'].first()
+
+        groups = list(charts.groupby(group_cols, observed=True, sort=True))
+        pages = max(1, math.ceil(len(groups) / charts_per_page))
+        page = st.number_input(f"Page (of {pages}, {len(groups)} charts)", min_value=1, max_value=pages, value=1)
+        first_chart = st.empty()
+
+        # Everything a chart depends on besides its own group key.
+        filter_state = (data_stamp, aggregation_level, selected_market, selected_sector, selected_industry,
+                        selected_sub_industry, selected_category, str(start_date), str(end_date))
+        page_groups = groups[(page - 1) * charts_per_page: page * charts_per_page]
+        page_payload = 0
+        for start in range(0, len(page_groups), cols_per_row):
+            cols = st.columns(cols_per_row)
+            for col, (keys, agg_df) in zip(cols, page_groups[start:start + cols_per_row]):
+                keys = keys if isinstance(keys, tuple) else (keys,)
+                sector_name = sector_names.get(keys if len(keys) > 1 else keys[0], "Unknown")
+                fig, sizes = chart_figure(keys, filter_state, agg_method, default_zoom_days,
+                                   MAX_BARS if downsample_long else None, sector_name, agg_df)
+                if not show_volume:
+                    fig.data = fig.data[:1]
+                col.plotly_chart(fig, use_container_width=True)
+                page_payload += sizes[show_volume]
+                if first_chart_s is None:
+                    first_chart_s = time.perf_counter() - run_started
+                    first_chart.caption(f"⏱️ First chart in {first_chart_s:.2f}s")
+        if first_chart_s is not None:
+            first_chart.caption(f"⏱️ First chart in {first_chart_s:.2f}s · {len(page_groups)} charts in "
+                                f"{time.perf_counter() - run_started:.2f}s · "
+                                f"{page_payload / 1e3:,.0f} KB chart payload")
 
 
 
@@ -231,6 +255,12 @@ if st.session_state.loaded:
 
         # Shared filters for Industry, Sub-Industry, Category
         table_df = vcp.copy()
+        if table_df.empty:
+            st.info("No screener results archived yet; they appear after the next refresh.")
+        else:
+            st.caption(f"Screener day: {table_df['date'].max():%d %b %Y}")
+            if st.checkbox("Only symbols on ≥3 screens this week"):
+                table_df = table_df[table_df['screens_this_week'] >= 3]
 
 
         # Filter level selection
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from driver_service.angel_api_fetch import AngelOneDataFetcher
+from driver_service.smartapi_stub import StubSmartConnect, stub_token_master, stub_universe
+
+
+class OfflineFetcher(AngelOneDataFetcher):
+    def __init__(self, n_symbols, latency, snapshot_dir):
+        self.n_symbols = n_symbols
+        super().__init__('stub', 'stub', '0000', 'JBSWY3DPEHPK3PXP', None, None,
+                         client_factory=lambda api_key: StubSmartConnect(api_key, latency=latency),
+                         snapshot_dir=snapshot_dir)
+
+    def load_token_master(self):
+        self.tokendf = stub_token_master(self.n_symbols)
+        self.build_token_index()
+
+    def prepare_stock_data(self):
+        self.df_final_output = stub_universe(self.n_symbols)
+
+
+def run(fetcher, **kwargs):
+    fetcher.client.calls = fetcher.client.throttled = 0
+    start = time.perf_counter()
+    df = fetcher.fetch_market_data(from_date="2025-01-01 09:15", to_date="2025-03-31 15:00", **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{kwargs or 'sequential'}: {elapsed:.2f}s, {len(fetcher.df_final_output) / elapsed:.2f} symbols/s, "
+          f"rows={len(df)}, calls={fetcher.client.calls}, throttled={fetcher.client.throttled}, "
+          f"failures={len(fetcher.fetch_failures)}")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.4)
+    parser.add_argument('--workers', type=int, default=6)
+    args = parser.parse_args()
+
+    # The stub universe never touches the reference snapshots; keep them out of the repo.
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        fetcher = OfflineFetcher(args.symbols, args.latency, snapshot_dir)
+        sequential = run(fetcher)
+        concurrent = run(fetcher, max_workers=args.workers)
+    assert sequential.equals(concurrent), "concurrent fetch returned different candles"
+    print("outputs identical")
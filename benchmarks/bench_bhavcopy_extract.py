@@ -0,0 +1,90 @@
+import io
+import os
+import sys
+import time
+import zipfile
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from driver_service.bhavcopy_data import OUTPUT_COLUMNS, read_bhavcopy_zip
+from driver_service.schema import PRICE_COLUMNS, trade_dates
+
+
+def synthetic_zip(weeks, nse_rows=2500, bse_rows=4500, seed=0):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        for day in pd.bdate_range('2025-01-06', periods=weeks * 5):
+            for exchange, rows in (('NSE', nse_rows), ('BSE', bse_rows)):
+                close = rng.uniform(5, 5000, rows).round(2)
+                if exchange == 'NSE':
+                    df = pd.DataFrame({'SYMBOL': [f"SYM{i}" for i in range(rows)], 'SERIES': 'EQ',
+                                       'OPEN': close, 'HIGH': close * 1.02, 'LOW': close * 0.98, 'CLOSE': close,
+                                       'LAST': close, 'PREVCLOSE': close, 'TOTTRDQTY': rng.integers(0, 10**7, rows),
+                                       'TOTTRDVAL': close * 100, 'TIMESTAMP': f"{day:%d-%b-%Y}", 'ISIN': 'INE000000000'})
+                else:
+                    df = pd.DataFrame({'SC_CODE': np.arange(500000, 500000 + rows), 'SC_NAME': 'NAME', 'SC_GROUP': 'A',
+                                       'SC_TYPE': 'Q', 'OPEN': close, 'HIGH': close * 1.02, 'LOW': close * 0.98,
+                                       'CLOSE': close, 'LAST': close, 'PREVCLOSE': close, 'NO_TRADES': 10,
+                                       'NO_OF_SHRS': rng.integers(0, 10**7, rows), 'NET_TURNOV': close * 100})
+                z.writestr(f"{day:%Y%m%d}_{exchange}.csv", df.to_csv(index=False))
+    buffer.seek(0)
+    return buffer
+
+
+# BhavcopyDownloader.extract_bhavcopy as it was before the vectorized reader, minus the zip removal.
+def legacy_extract(zip_file):
+    all_data = []
+    with zipfile.ZipFile(zip_file, 'r') as z:
+        for csv_filename in z.namelist():
+            for exchange in ["NSE.csv", "BSE.csv"]:
+                if exchange in csv_filename:
+                    with z.open(csv_filename) as f:
+                        stocks_data = pd.read_csv(f)
+                        if exchange == "NSE.csv":
+                            stocks_data.rename(columns={"SYMBOL": "NSE_BSE_code", "OPEN": "open", "CLOSE": "close",
+                                                        "HIGH": "high", "LOW": "low", "TOTTRDQTY": "volume"}, inplace=True)
+                        else:
+                            stocks_data.rename(columns={"SC_CODE": "NSE_BSE_code", "OPEN": "open", "CLOSE": "close",
+                                                        "HIGH": "high", "LOW": "low", "NO_OF_SHRS": "volume"}, inplace=True)
+                        stocks_data = stocks_data[['NSE_BSE_code', 'open', 'close', 'low', 'high', 'volume']]
+                        bhavcopy_date = datetime.strptime(csv_filename[:8], "%Y%m%d").date()
+                        stocks_data['datetime'] = pd.to_datetime(bhavcopy_date, format="%Y-%m-%d").tz_localize('Asia/Kolkata')
+                        stocks_data['datetime'] = stocks_data['datetime'].apply(lambda x: x.isoformat())
+                        stocks_data['market'] = exchange.split('.')[0]
+                        all_data.append(stocks_data)
+    return pd.concat(all_data, ignore_index=True)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weeks', type=int, default=4)
+    args = parser.parse_args()
+
+    archive = synthetic_zip(args.weeks)
+    print(f"zip: {args.weeks * 5} trading days, {archive.getbuffer().nbytes / 1e6:.1f} MB")
+
+    legacy, legacy_s = timed(legacy_extract, archive)
+    archive.seek(0)
+    serial, serial_s = timed(read_bhavcopy_zip, archive, max_workers=1)
+    archive.seek(0)
+    parallel, parallel_s = timed(read_bhavcopy_zip, archive)
+
+    # Same rows and values; the reader now yields native trade dates and float32 prices.
+    expected = legacy.assign(date=trade_dates(legacy['datetime']))[OUTPUT_COLUMNS]
+    pd.testing.assert_frame_equal(expected.astype({col: 'float32' for col in PRICE_COLUMNS}), parallel)
+    pd.testing.assert_frame_equal(serial, parallel)
+    print(f"legacy            {legacy_s:6.2f}s")
+    print(f"vectorized serial {serial_s:6.2f}s  ({legacy_s / serial_s:.1f}x)")
+    print(f"vectorized pool   {parallel_s:6.2f}s  ({legacy_s / parallel_s:.1f}x)")
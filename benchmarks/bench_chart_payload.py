@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.bench_drive_formats import synthetic_panel
+from driver_service.charts import candlestick_figure, payload_bytes, MAX_BARS
+from driver_service.cube import ohlc_aggregate
+from driver_service.schema import conform
+
+
+def legacy_figure(agg_df, title, default_zoom_days, pad_days=5, right_padding_days=10):
+    # The dashboards' figure before the shared layout: full daily series as arrays
+    # and the process default template (Streamlit's, as in the apps).
+    padding = pd.DataFrame({
+        'date': pd.date_range(start=agg_df['date'].min() - pd.Timedelta(days=pad_days), periods=pad_days),
+        'open': np.nan, 'high': np.nan, 'low': np.nan, 'close': np.nan, 'volume': 0
+    })
+    agg_df = pd.concat([padding, agg_df], ignore_index=True)
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(
+        x=agg_df['date'], open=agg_df['open'], high=agg_df['high'],
+        low=agg_df['low'], close=agg_df['close'],
+        name='Price', increasing_line_color='limegreen', decreasing_line_color='red'
+    ))
+    fig.add_trace(go.Bar(
+        x=agg_df['date'], y=agg_df['volume'], name='Volume',
+        marker_color='rgba(135, 206, 250, 0.2)', yaxis='y2'
+    ))
+    fig.update_layout(
+        xaxis=dict(range=[agg_df['date'].max() - pd.Timedelta(days=default_zoom_days),
+                          agg_df['date'].max() + pd.Timedelta(days=right_padding_days)], autorange=False),
+        title={'text': title, 'x': 0.5, 'xanchor': 'center'},
+        xaxis_title="Date", yaxis_title="Price",
+        yaxis2=dict(overlaying='y', side='right', title='Volume', showgrid=False),
+        height=450, margin=dict(t=100, b=20), plot_bgcolor="#111", paper_bgcolor="#111",
+        font=dict(color='white'), xaxis_rangeslider_visible=False, showlegend=False,
+    )
+    return fig
+
+
+def build(make, charts):
+    start = time.perf_counter()
+    figures = [make(agg_df, f"<b>Industry:</b> {industry}") for industry, agg_df in charts.groupby('Industry')]
+    size = payload_bytes(figures)
+    return size, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--symbols', type=int, default=6500)
+    parser.add_argument('--charts', type=int, default=24, help="charts on one page")
+    args = parser.parse_args()
+
+    try:
+        # Inside the apps Streamlit's plotly template is the default, and the legacy
+        # figures embedded it; register it the same way st.plotly_chart does.
+        from streamlit.elements.lib.streamlit_plotly_theme import configure_streamlit_plotly_theme
+        configure_streamlit_plotly_theme()
+    except ImportError:
+        print("streamlit not installed: legacy baseline uses plotly's default template")
+    print(f"default template: {pio.templates.default}")
+
+    panel = conform(synthetic_panel(args.days, args.symbols))
+    charts = ohlc_aggregate(panel, ['Industry'], 'weighted_avg')
+    charts = charts[charts['Industry'].isin(sorted(charts['Industry'].unique())[:args.charts])]
+    charts = charts[['Industry', 'date', 'open', 'high', 'low', 'close', 'volume']]
+
+    modes = {
+        f'legacy ({pio.templates.default} template, arrays)': lambda df, title: legacy_figure(df.drop(columns='Industry'), title, 60),
+        'shared layout, daily': lambda df, title: candlestick_figure(df, title, 60),
+        f'shared layout, weekly > {MAX_BARS} bars': lambda df, title: candlestick_figure(df, title, 60, max_bars=MAX_BARS),
+    }
+    print(f"{args.charts} charts x {charts['date'].nunique()} trading days")
+    baseline = None
+    for name, make in modes.items():
+        size, elapsed = build(make, charts)
+        baseline = baseline or size
+        print(f"{name:38s} {size / 1e3:9.1f} KB  ({size / baseline:5.1%})  built+serialized in {elapsed:.2f}s")
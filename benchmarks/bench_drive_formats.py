@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from driver_service.constant import PANEL_CSV_DTYPES
+from driver_service.file_formats import MIME_TYPES, frame_to_buffer, read_frame
+
+
+def synthetic_panel(days, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2025-06-30', periods=days)
+    n = days * symbols
+    close = rng.uniform(10, 5000, n).round(2)
+    industries = np.array([f"Industry {i}" for i in range(150)])
+    return pd.DataFrame({
+        'NSE_BSE_code': np.tile([f"SYM{i}" for i in range(symbols)], days),
+        'open': (close * rng.uniform(0.97, 1.03, n)).round(2),
+        'close': close,
+        'low': (close * 0.97).round(2),
+        'high': (close * 1.03).round(2),
+        'volume': rng.integers(0, 5_000_000, n),
+        'datetime': np.repeat([f"{d:%Y-%m-%d}T00:00:00+05:30" for d in dates], symbols),
+        'market': rng.choice(['NSE', 'BSE'], n),
+        'Name': np.tile([f"Company {i} Limited" for i in range(symbols)], days),
+        'Industry': np.tile(industries[np.arange(symbols) % len(industries)], days),
+        'Mapped Sector': np.tile([f"Sector {i % 20}" for i in range(symbols)], days),
+        'Category': np.tile(np.where(np.arange(symbols) < 100, 'Large-cap', 'Small-cap'), days),
+        'Sub Industry': np.tile([f"Sub {i % 400}" for i in range(symbols)], days),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--symbols', type=int, default=4000)
+    args = parser.parse_args()
+
+    df = synthetic_panel(args.days, args.symbols)
+    print(f"panel: {len(df):,} rows")
+    for fmt in MIME_TYPES:
+        start = time.perf_counter()
+        buffer = frame_to_buffer(df, fmt)
+        write_s = time.perf_counter() - start
+        size = buffer.getbuffer().nbytes
+
+        start = time.perf_counter()
+        back = read_frame(buffer, fmt, dtype=PANEL_CSV_DTYPES)
+        read_s = time.perf_counter() - start
+
+        assert len(back) == len(df) and np.allclose(back['close'], df['close'])
+        print(f"{fmt:8s} {size / 1e6:8.1f} MB  write {write_s:6.2f}s  read {read_s:6.2f}s  "
+              f"in-memory {back.memory_usage(deep=True).sum() / 1e6:7.1f} MB")
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.bench_drive_formats import synthetic_panel
+from driver_service.ohlcv_store import OHLCVStore
+from driver_service.schema import conform
+
+
+def legacy_load(path):
+    # How the panel was loaded before the canonical schema: every label a Python
+    # string and the trade date split out of the ISO timestamp.
+    df = pd.read_parquet(path)
+    df[['date', 'time']] = df['datetime'].str.split('T', expand=True)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--symbols', type=int, default=6500)
+    args = parser.parse_args()
+
+    panel = synthetic_panel(args.days, args.symbols)
+    workdir = tempfile.mkdtemp()
+    try:
+        legacy_path = os.path.join(workdir, 'legacy.parquet')
+        panel.to_parquet(legacy_path, index=False)
+        store = OHLCVStore(os.path.join(workdir, 'store'))
+        store.append(panel)
+
+        legacy, legacy_s = timed(legacy_load, legacy_path)
+        typed, typed_s = timed(store.read)
+
+        assert len(legacy) == len(typed)
+        pd.testing.assert_frame_equal(
+            conform(legacy.drop(columns=['time'])).sort_values(['date', 'NSE_BSE_code']).reset_index(drop=True)[typed.columns],
+            typed.sort_values(['date', 'NSE_BSE_code']).reset_index(drop=True), check_categorical=False)
+
+        legacy_mb = legacy.memory_usage(deep=True).sum() / 1e6
+        typed_mb = typed.memory_usage(deep=True).sum() / 1e6
+        print(f"panel: {len(panel):,} rows ({args.days} days x {args.symbols} symbols)")
+        print(f"legacy strings  {legacy_mb:8.1f} MB  load {legacy_s:6.2f}s")
+        print(f"canonical       {typed_mb:8.1f} MB  load {typed_s:6.2f}s  "
+              f"({legacy_mb / typed_mb:.1f}x smaller, {legacy_s / typed_s:.1f}x faster)")
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.bench_drive_formats import synthetic_panel
+from driver_service.cube import build_cube, ohlc_aggregate, rollup
+from driver_service.schema import conform
+
+
+def lambda_weighted_avg(df):
+    # The dashboards' former path: one masked copy per industry, then a Python
+    # lambda per trading day computing volume.sum() five times.
+    frames = []
+    for industry in sorted(df['Industry'].dropna().unique()):
+        industry_df = df[df['Industry'] == industry].copy()
+        agg_df = industry_df.groupby('date').apply(lambda g: pd.Series({
+            'open': (g['open'] * g['volume']).sum() / g['volume'].sum(),
+            'high': (g['high'] * g['volume']).sum() / g['volume'].sum(),
+            'low': (g['low'] * g['volume']).sum() / g['volume'].sum(),
+            'close': (g['close'] * g['volume']).sum() / g['volume'].sum(),
+            'volume': g['volume'].sum()
+        })).reset_index().sort_values('date')
+        agg_df.insert(0, 'Industry', industry)
+        frames.append(agg_df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--symbols', type=int, default=6500)
+    args = parser.parse_args()
+
+    panel = conform(synthetic_panel(args.days, args.symbols))
+    # A few untraded days for whole industries: the lambda path turns these into NaN (0/0).
+    idle = panel['Industry'].isin(panel['Industry'].cat.categories[:3]) & (panel['date'] == panel['date'].max())
+    panel.loc[idle, 'volume'] = 0
+
+    legacy, legacy_s = timed(lambda_weighted_avg, panel)
+    vectorized, vectorized_s = timed(ohlc_aggregate, panel, ['Industry'], 'weighted_avg')
+    cube, cube_s = timed(build_cube, panel)
+    rolled, rollup_s = timed(rollup, cube, ['Industry'], 'weighted_avg')
+
+    cols = ['open', 'high', 'low', 'close', 'volume']
+    traded = legacy['volume'].to_numpy() > 0
+    for result in (vectorized, rolled):
+        assert len(result) == len(legacy)
+        assert (result['Industry'].to_numpy() == legacy['Industry'].to_numpy()).all()
+        np.testing.assert_allclose(result[cols].to_numpy(float)[traded], legacy[cols].to_numpy(float)[traded], rtol=1e-9)
+        assert result.loc[~traded, cols].notna().all().all()
+
+    print(f"panel: {len(panel):,} rows, {panel['Industry'].nunique()} industries, "
+          f"{(~traded).sum()} zero-volume industry-days")
+    print(f"groupby.apply lambda   {legacy_s:7.2f}s")
+    print(f"vectorized one pass    {vectorized_s:7.2f}s  ({legacy_s / vectorized_s:.0f}x)")
+    print(f"cube rollup            {rollup_s:7.3f}s  (+{cube_s:.2f}s once per load, {len(cube):,} cube rows)")
@@ -1,18 +1,32 @@
-import os
 import re
 import time
+import random
 import numpy as np
 import pandas as pd
 import requests
 import pyotp
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from logzero import logger
 from SmartApi import SmartConnect  # or from smartapi.smartConnect import SmartConnect
+from driver_service.rate_limiter import candle_rate_limiter, is_throttled
+from driver_service.market_cap import cap_rank, universe_categories
+from driver_service.reference_data import ReferenceData
+from driver_service.constant import REFERENCE_SNAPSHOT_DIR
+
+
+class CandleFetchError(Exception):
+    def __init__(self, message, attempts):
+        super().__init__(message)
+        self.attempts = attempts
 
 
 class AngelOneDataFetcher:
-    def __init__(self, api_key, username, pin, totpkey, map_file, stock_file):
+    retry_backoff = 0.5
+
+    def __init__(self, api_key, username, pin, totpkey, map_file, stock_file, client_factory=SmartConnect,
+                 snapshot_dir=REFERENCE_SNAPSHOT_DIR):
         self.api_key = api_key
         self.username = username
         self.pin = pin
@@ -20,19 +34,22 @@ class AngelOneDataFetcher:
         self.session = None
         self.refresh_token = None
         self.client = None
+        self.client_factory = client_factory
 
         self.mapping_sheet_path = map_file
         self.stock_file_path = stock_file
+        self.reference = ReferenceData(snapshot_dir, stock_file, map_file)
 
         self.tokendf = None
         self.df_final_output = None
+        self.fetch_failures = None
 
         self.authenticate()
         self.load_token_master()
         self.prepare_stock_data()
 
     def authenticate(self):
-        self.client = SmartConnect(self.api_key)
+        self.client = self.client_factory(self.api_key)
         data = self.client.generateSession(self.username, self.pin, pyotp.TOTP(self.totpkey).now())
         self.refresh_token = data['data']['refreshToken']
         self.client.getProfile(self.refresh_token)
@@ -41,25 +58,23 @@ class AngelOneDataFetcher:
         url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
         d = requests.get(url).json()
         self.tokendf = pd.DataFrame.from_dict(d)
+        self.build_token_index()
 
-    def prepare_stock_data(self):
-        all_stock = pd.read_csv(self.stock_file_path)
-        all_stock = all_stock[['Name', 'BSE Code', 'NSE Code', 'Industry', 'Current Price', 'Market Capitalization']]
-        mapping_sheet = pd.read_excel(self.mapping_sheet_path)
-
-        df = pd.merge(all_stock, mapping_sheet, on=['Industry'], how='left')
-        df = df.sort_values("Market Capitalization", ascending=False)
-        df['Rank'] = df["Market Capitalization"].rank(ascending=False, method='first')
-
-        def categorize(rank):
-            if rank <= 100:
-                return 'Large-cap'
-            elif 101 <= rank <= 250:
-                return 'Mid-cap'
-            else:
-                return 'Small-cap'
+    def build_token_index(self):
+        # One row per lookup key; NSE rows win over any other exchange segment,
+        # otherwise the first listed row is kept, same as get_token_by_value used to do.
+        df = self.tokendf[['token', 'name', 'exch_seg']].copy()
+        df['market'] = np.where(df['exch_seg'] == 'NSE', 'NSE', 'BSE')
+        df = df.sort_values('market', ascending=False, kind='stable')
+
+        self.token_index = df.drop_duplicates('token').set_index('token', drop=False)[['token', 'market']].rename_axis('key')
+        self.name_index = df.drop_duplicates('name').set_index('name')[['token', 'market']].rename_axis('key')
 
-        df['Category'] = df['Rank'].apply(categorize)
+    def prepare_stock_data(self):
+        df = self.reference.universe()
+        df = df.sort_values("Market Capitalization", ascending=False, kind='stable')
+        df['Rank'] = cap_rank(df["Market Capitalization"]) + 1
+        df['Category'] = universe_categories(df["Market Capitalization"])
         df.replace(np.nan, 'BharPra', inplace=True)
         df['NSE_BSE_code'] = np.where(df['NSE Code'] == "BharPra", df['BSE Code'], df['NSE Code'])
 
@@ -71,56 +86,124 @@ class AngelOneDataFetcher:
 
     def get_token_by_value(self, value):
         if self.is_float(value):
-            value = str(int(float(value)))
-            filtered_df = self.tokendf[self.tokendf['token'] == value]
+            index, key = self.token_index, str(int(float(value)))
         else:
-            filtered_df = self.tokendf[self.tokendf['name'] == value]
+            index, key = self.name_index, value
 
-        if filtered_df.empty:
+        if key not in index.index:
             return None, None
-
-        nse_row = filtered_df[filtered_df['exch_seg'] == 'NSE']
-        if not nse_row.empty:
-            return nse_row.iloc[0]['token'], "NSE"
-        else:
-            return filtered_df.iloc[0]['token'], "BSE"
-
-    def fetch_market_data(self, from_date=None, to_date=None, stock_df=None):
+        token, market = index.loc[key]
+        return token, market
+
+    def resolve_many(self, codes):
+        codes = pd.Series(codes)
+        text = codes.astype(str)
+        numeric = text.str.match(r'^-?\d+(\.\d+)?$')
+
+        by_token = pd.to_numeric(text[numeric]).astype('int64').astype(str)
+        resolved = pd.concat([
+            self.token_index.reindex(by_token.values).set_axis(by_token.index),
+            self.name_index.reindex(codes[~numeric].values).set_axis(codes[~numeric].index),
+        ])
+        return resolved.reindex(codes.index)
+
+    def fetch_candles(self, token, market, from_date, to_date, rate_limiter=None, max_retries=5):
+        historic_param = {
+            "exchange": market,
+            "symboltoken": str(token),
+            "interval": "ONE_DAY",
+            "fromdate": from_date,
+            "todate": to_date
+        }
+
+        for attempt in range(1, max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                response = self.client.getCandleData(historic_param)
+            except Exception as e:
+                if not is_throttled(e) or attempt == max_retries:
+                    raise CandleFetchError(str(e), attempt) from e
+            else:
+                # SmartAPI hands back the raw body (text, or None) when it isn't JSON,
+                # e.g. a gateway's rate-limit page: retried if throttled, else a failure.
+                throttled = is_throttled(response)
+                if not isinstance(response, dict) and (not throttled or attempt == max_retries):
+                    raise CandleFetchError(f"unexpected response: {str(response)[:200]!r}", attempt)
+                if not throttled:
+                    return response, attempt
+                if attempt == max_retries:
+                    raise CandleFetchError(response.get('message'), attempt)
+
+            time.sleep(self.retry_backoff * 2 ** (attempt - 1) * (1 + random.random()))
+
+    def fetch_market_data(self, from_date=None, to_date=None, stock_df=None, max_workers=1, rate_limiter=None, max_retries=5,
+                          watermarks=None):
+        # watermarks (CandleWatermarks.from_store) narrow each symbol's window to the days
+        # after the store's newest candle. They are read-only: nothing here writes the
+        # returned candles to the store, so only the store's own updates advance them.
         if from_date is None:
             from_date = "2023-06-02 09:15"
         if to_date is None:
             to_date = f"{datetime.today().strftime('%Y-%m-%d')} 15:00"
         if stock_df is None:
             stock_df = self.df_final_output.copy()
-
-        df_final = pd.DataFrame()
-
-        for _, row in tqdm(stock_df.iterrows(), total=len(stock_df)):
-            code = row['NSE_BSE_code']
-            token, market = self.get_token_by_value(code)
-
-            if token:
-                historic_param = {
-                    "exchange": market,
-                    "symboltoken": str(token),
-                    "interval": "ONE_DAY",
-                    "fromdate": from_date,
-                    "todate": to_date
-                }
-
-                try:
-                    data1 = self.client.getCandleData(historic_param)
-                    data = pd.DataFrame(data1['data'], columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
-                    if not data.empty:
-                        data['NSE_BSE_code'] = code
-                        data['Category'] = row['Category']
-                        data['Industry'] = row['Industry']
-                        data['Market'] = market
-                        data['Sector'] = row['Mapped Sector']
-                        data['Name'] = row['Name']
-                        data['Market Capitalization'] = row['Market Capitalization']
-                        df_final = pd.concat([df_final, data], ignore_index=True)
-                except Exception as e:
-                    logger.warning(f"Historic API failed for token {token}: {e}")
-
-        return df_final
+        if rate_limiter is None and max_workers > 1:
+            rate_limiter = candle_rate_limiter()
+
+        stock_df = stock_df.reset_index(drop=True)
+        resolved = self.resolve_many(stock_df['NSE_BSE_code'])
+        results = {}
+        failures = []
+
+        def fetch(pos, code, token, market, start):
+            try:
+                response, attempts = self.fetch_candles(token, market, start, to_date, rate_limiter, max_retries)
+            except CandleFetchError as e:
+                logger.warning(f"Historic API failed for token {token}: {e}")
+                failures.append({'NSE_BSE_code': code, 'token': token, 'market': market, 'error': str(e), 'attempts': e.attempts})
+                return
+            if not response.get('status', True):
+                failures.append({'NSE_BSE_code': code, 'token': token, 'market': market, 'error': response.get('message'), 'attempts': attempts})
+                return
+            results[pos] = (response.get('data'), market)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            up_to_date = 0
+            for pos, code, token, market in zip(stock_df.index, stock_df['NSE_BSE_code'], resolved['token'], resolved['market']):
+                start = from_date if watermarks is None else watermarks.window_start(code, from_date, to_date)
+                if start is None:
+                    up_to_date += 1
+                elif isinstance(token, str) and token:
+                    futures.append(executor.submit(fetch, pos, code, token, market, start))
+                else:
+                    failures.append({'NSE_BSE_code': code, 'token': None, 'market': None, 'error': 'symbol not found in token master', 'attempts': 0})
+            if up_to_date:
+                logger.info(f"Skipping {up_to_date} symbols already current up to {to_date}")
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                future.result()
+
+        self.fetch_failures = pd.DataFrame(failures, columns=['NSE_BSE_code', 'token', 'market', 'error', 'attempts'])
+
+        # Candles are gathered as flat lists and materialized once; the reference
+        # columns are attached afterwards with a single join on the stock row.
+        candles, row_ids, markets = [], [], []
+        for pos in sorted(results):
+            data, market = results[pos]
+            if data:
+                candles.extend(data)
+                row_ids.extend([pos] * len(data))
+                markets.extend([market] * len(data))
+
+        df_final = pd.DataFrame(candles, columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
+        if df_final.empty:
+            return df_final
+        df_final['Market'] = markets
+
+        metadata = stock_df[['NSE_BSE_code', 'Category', 'Industry', 'Mapped Sector', 'Name', 'Market Capitalization']]
+        metadata = metadata.rename(columns={'Mapped Sector': 'Sector'})
+        df_final = df_final.join(metadata, on=pd.Series(row_ids, name='row'))
+
+        return df_final[['datetime', 'open', 'high', 'low', 'close', 'volume', 'NSE_BSE_code', 'Category',
+                         'Industry', 'Market', 'Sector', 'Name', 'Market Capitalization']]
@@ -1,9 +1,14 @@
 import pickle, os
 from google_auth_oauthlib.flow import InstalledAppFlow
+import httplib2
+import google_auth_httplib2
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 from google.auth.transport.requests import Request
 
-def create_service(client_secret_file, api_name, api_version, scopes):
+def create_service(client_secret_file, api_name, api_version, scopes, thread_safe=False):
+    # thread_safe: every request gets its own authorized httplib2.Http (httplib2 is not
+    # thread-safe), for a service shared across threads such as Streamlit sessions.
     cred = None
     pickle_file = f'token_{api_name}_{api_version}.pickle'
 
@@ -22,8 +27,14 @@ def create_service(client_secret_file, api_name, api_version, scopes):
             pickle.dump(cred, token)
 
     try:
-        service = build(api_name, api_version, credentials=cred)
-        return service
+        if not thread_safe:
+            return build(api_name, api_version, credentials=cred)
+
+        def build_request(http, *args, **kwargs):
+            return HttpRequest(google_auth_httplib2.AuthorizedHttp(cred, http=httplib2.Http()), *args, **kwargs)
+
+        return build(api_name, api_version, requestBuilder=build_request,
+                     http=google_auth_httplib2.AuthorizedHttp(cred, http=httplib2.Http()))
     except Exception as e:
         print('Unable to connect:', e)
         return None
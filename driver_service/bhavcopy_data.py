@@ -5,6 +5,7 @@ import warnings
 import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
@@ -12,16 +13,73 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
+from driver_service.bhavcopy_http import HttpBhavcopyFetcher
+from driver_service.market_cap import group_tercile_categories
+from driver_service.reference_data import ReferenceData
+from driver_service.constant import REFERENCE_SNAPSHOT_DIR
 
 warnings.filterwarnings('ignore')
 
+# Source columns of the NSE / BSE bhavcopy members, renamed to the panel's names.
+BHAVCOPY_COLUMNS = {
+    "NSE": {"SYMBOL": "NSE_BSE_code", "OPEN": "open", "CLOSE": "close", "HIGH": "high", "LOW": "low", "TOTTRDQTY": "volume"},
+    "BSE": {"SC_CODE": "NSE_BSE_code", "OPEN": "open", "CLOSE": "close", "HIGH": "high", "LOW": "low", "NO_OF_SHRS": "volume"},
+}
+BHAVCOPY_DTYPES = {
+    "NSE": {"SYMBOL": str, "OPEN": "float32", "CLOSE": "float32", "HIGH": "float32", "LOW": "float32", "TOTTRDQTY": "int64"},
+    "BSE": {"SC_CODE": "int64", "OPEN": "float32", "CLOSE": "float32", "HIGH": "float32", "LOW": "float32", "NO_OF_SHRS": "int64"},
+}
+OUTPUT_COLUMNS = ['NSE_BSE_code', 'open', 'close', 'low', 'high', 'volume', 'date', 'market']
+
+
+def bhavcopy_trade_date(member_name):
+    # Members are named YYYYMMDD_<EXCHANGE>.csv; every row of a member shares this trade date.
+    try:
+        return np.datetime64(datetime.strptime(member_name[:8], "%Y%m%d"), 'ns')
+    except ValueError:
+        return np.datetime64('NaT', 'ns')
+
+
+def read_bhavcopy_member(z, member_name, exchange):
+    with z.open(member_name) as f:
+        stocks_data = pd.read_csv(f, usecols=list(BHAVCOPY_COLUMNS[exchange]), dtype=BHAVCOPY_DTYPES[exchange])
+    stocks_data.rename(columns=BHAVCOPY_COLUMNS[exchange], inplace=True)
+    stocks_data['date'] = bhavcopy_trade_date(member_name)
+    stocks_data['market'] = exchange
+    return stocks_data[OUTPUT_COLUMNS]
+
+
+def read_bhavcopy_zip(source, max_workers=None):
+    # `source` is a path or a binary file object; members are decompressed and parsed
+    # on a thread pool straight from the archive, with no temporary files.
+    with zipfile.ZipFile(source, 'r') as z:
+        members = [
+            (name, exchange)
+            for name in z.namelist()
+            for exchange in BHAVCOPY_COLUMNS
+            if f"{exchange}.csv" in name
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            all_data = list(executor.map(lambda m: read_bhavcopy_member(z, *m), members))
+
+    if all_data:
+        return pd.concat(all_data, ignore_index=True)
+    return pd.DataFrame(columns=OUTPUT_COLUMNS).astype({'date': 'datetime64[ns]'})
+
 
 class BhavcopyDownloader:
-    def __init__(self, download_dir, all_stock_path, mapping_sheet_path):
+    def __init__(self, download_dir, all_stock_path, mapping_sheet_path, backend="selenium"):
         self.download_dir = download_dir
         self.all_stock_path = all_stock_path
         self.mapping_sheet_path = mapping_sheet_path
-        self.driver = self._setup_driver()
+        self.backend = backend
+        self.reference = ReferenceData(REFERENCE_SNAPSHOT_DIR, all_stock_path, mapping_sheet_path)
+        self.driver = None
+        self.http = None
+        if backend == "http":
+            self.http = HttpBhavcopyFetcher(download_dir)
+        else:
+            self.driver = self._setup_driver()
 
     def _setup_driver(self):
 
@@ -52,6 +110,10 @@ class BhavcopyDownloader:
         return driver
 
     def download_bhavcopy(self, url, last_date):
+        if self.http is not None:
+            # `url` is the samco.in form page, only used by the browser backend.
+            return self.http.download_bhavcopy(last_date)
+
         self.driver.get(url)
         time.sleep(2)
 
@@ -72,87 +134,37 @@ class BhavcopyDownloader:
         )
         download_button.click()
 
-        time.sleep(10)
+        return self._wait_for_download(last_date)
 
-    def extract_bhavcopy(self, last_date):
+    def _wait_for_download(self, last_date, timeout=60):
+        # Chrome writes <name>.crdownload and renames it when the download completes.
+        file_name = f"{datetime.strptime(last_date, '%d-%m-%Y').strftime('%Y-%m-%d')}-{datetime.today().strftime('%Y-%m-%d')}.zip"
+        zip_file_path = os.path.join(self.download_dir, file_name)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(zip_file_path) and not os.path.exists(f"{zip_file_path}.crdownload"):
+                return zip_file_path
+            time.sleep(0.25)
+        raise TimeoutError(f"Bhavcopy download did not finish within {timeout}s: {zip_file_path}")
+
+    def extract_bhavcopy(self, last_date, max_workers=None):
         file_name = f"{datetime.strptime(last_date, '%d-%m-%Y').strftime('%Y-%m-%d')}-{datetime.today().strftime('%Y-%m-%d')}.zip"
         zip_file_path = os.path.join(self.download_dir, file_name)
 
         if not os.path.exists(zip_file_path):
             raise FileNotFoundError(f"ZIP file not found at: {zip_file_path}")
 
-        all_data = []
-        with zipfile.ZipFile(zip_file_path, 'r') as z:
-            for csv_filename in z.namelist():
-                for exchange in ["NSE.csv", "BSE.csv"]:
-                    if exchange in csv_filename:
-                        with z.open(csv_filename) as f:
-                            stocks_data = pd.read_csv(f)
-
-                            if exchange == "NSE.csv":
-                                stocks_data.rename(columns={
-                                    "SYMBOL": "NSE_BSE_code",
-                                    "OPEN": "open",
-                                    "CLOSE": "close",
-                                    "HIGH": "high",
-                                    "LOW": "low",
-                                    "TOTTRDQTY": "volume"
-                                }, inplace=True)
-                            else:
-                                stocks_data.rename(columns={
-                                    "SC_CODE": "NSE_BSE_code",
-                                    "OPEN": "open",
-                                    "CLOSE": "close",
-                                    "HIGH": "high",
-                                    "LOW": "low",
-                                    "NO_OF_SHRS": "volume"
-                                }, inplace=True)
-
-                            stocks_data = stocks_data[['NSE_BSE_code', 'open', 'close', 'low', 'high', 'volume']]
-
-                            try:
-                                date_part = csv_filename[:8]
-                                bhavcopy_date = datetime.strptime(date_part, "%Y%m%d").date()
-                            except:
-                                bhavcopy_date = None
-
-                            stocks_data['datetime'] = pd.to_datetime(bhavcopy_date, format="%Y-%m-%d").tz_localize('Asia/Kolkata')
-                            stocks_data['datetime'] = stocks_data['datetime'].apply(lambda x: x.isoformat())
-                            stocks_data['market'] = exchange.split('.')[0]
-
-                            all_data.append(stocks_data)
-
-        if all_data:
-            combined_df = pd.concat(all_data, ignore_index=True)
-        else:
-            combined_df = pd.DataFrame()
+        combined_df = read_bhavcopy_zip(zip_file_path, max_workers=max_workers)
 
         os.remove(zip_file_path)
         return combined_df
 
     def process_all_stock(self):
-        all_stock = pd.read_csv(self.all_stock_path)
-        all_stock = all_stock[['Name', 'BSE Code', 'NSE Code', 'Industry', 'Current Price', 'Market Capitalization']]
-        mapping_sheet = pd.read_excel(self.mapping_sheet_path)
-        df_final_output = pd.merge(all_stock, mapping_sheet, on=['Industry'], how='left')
-
-        df_test = df_final_output.dropna(subset=['Market Capitalization', 'Industry'])
-
-        def assign_category(group):
-            group = group.sort_values('Market Capitalization', ascending=False).reset_index(drop=True)
-            n = len(group)
-            for i in range(n):
-                if i < n / 3:
-                    group.loc[i, 'Category'] = 'Large-cap'
-                elif i < 2 * n / 3:
-                    group.loc[i, 'Category'] = 'Mid-cap'
-                else:
-                    group.loc[i, 'Category'] = 'Small-cap'
-            return group
-
-        df_test = df_test.groupby('Industry', group_keys=False).apply(assign_category)
-        df_test = df_test[['Name', 'Category']]
-        df_final_output = pd.merge(df_final_output, df_test, on=['Name'], how="left")
+        df_final_output = self.reference.universe()
+
+        # Per-industry terciles, assigned by row so duplicate names can't fan out.
+        df_final_output['Category'] = group_tercile_categories(df_final_output['Market Capitalization'],
+                                                               df_final_output['Industry'])
 
         df_final_output['BSE Code'] = df_final_output['BSE Code'].fillna(0).astype(int)
         df_final_output.replace(np.nan, 'BhaPra', inplace=True)
@@ -168,4 +180,7 @@ class BhavcopyDownloader:
         return final_merged
 
     def close(self):
-        self.driver.quit()
+        if self.driver is not None:
+            self.driver.quit()
+        if self.http is not None:
+            self.http.close()
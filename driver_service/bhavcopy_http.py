@@ -0,0 +1,101 @@
+import io
+import os
+import zipfile
+import pandas as pd
+import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Exchange archives in the UDiFF common bhavcopy format.
+NSE_URL_TEMPLATE = "https://nsearchives.nseindia.com/content/cm/BhavCopy_NSE_CM_0_0_0_{day:%Y%m%d}_F_0000.csv.zip"
+BSE_URL_TEMPLATE = "https://www.bseindia.com/download/BhavCopy/Equity/BhavCopy_BSE_CM_0_0_0_{day:%Y%m%d}_F_0000.CSV"
+
+# UDiFF columns -> the legacy per-exchange headers extract_bhavcopy reads.
+UDIFF_COLUMNS = {
+    "NSE": {"TckrSymb": "SYMBOL", "OpnPric": "OPEN", "HghPric": "HIGH", "LwPric": "LOW", "ClsPric": "CLOSE", "TtlTradgVol": "TOTTRDQTY"},
+    "BSE": {"FinInstrmId": "SC_CODE", "OpnPric": "OPEN", "HghPric": "HIGH", "LwPric": "LOW", "ClsPric": "CLOSE", "TtlTradgVol": "NO_OF_SHRS"},
+}
+
+# Rows kept per exchange, matching the samco.in download: NSE's normal equity series
+# only (no BE/BZ/SM/bond series, which would repeat a symbol on the same day).
+SERIES = {"NSE": ("EQ",), "BSE": None}
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+# Chrome-free bhavcopy backend: pulls each trading day's NSE and BSE archives over
+# one pooled keep-alive session and repackages them into the same
+# <from>-<to>.zip (YYYYMMDD_NSE.csv / YYYYMMDD_BSE.csv) that the samco.in download
+# produces, so BhavcopyDownloader.extract_bhavcopy reads either unchanged.
+class HttpBhavcopyFetcher:
+    def __init__(self, download_dir, nse_url_template=NSE_URL_TEMPLATE, bse_url_template=BSE_URL_TEMPLATE,
+                 max_workers=4, timeout=30):
+        self.download_dir = download_dir
+        self.url_templates = {"NSE": nse_url_template, "BSE": bse_url_template}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = self._setup_session()
+
+    def _setup_session(self):
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers * 2, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch(self, exchange, day):
+        url = self.url_templates[exchange].format(day=day)
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            return None  # holiday or not yet published
+        response.raise_for_status()
+
+        # The response itself says when the file is complete: the body must match
+        # Content-Length and, for zips, the archive must pass its CRC check.
+        content = response.content
+        expected = response.headers.get("Content-Length")
+        if expected is not None and "Content-Encoding" not in response.headers and int(expected) != len(content):
+            raise IncompleteDownload(f"{url}: got {len(content)} of {expected} bytes")
+        if content[:2] == b"PK":
+            with zipfile.ZipFile(io.BytesIO(content)) as z:
+                if z.testzip() is not None:
+                    raise IncompleteDownload(f"{url}: corrupt archive")
+                content = z.read(z.namelist()[0])
+
+        df = pd.read_csv(io.BytesIO(content), usecols=["SctySrs"] + list(UDIFF_COLUMNS[exchange]))
+        if SERIES[exchange] is not None:
+            df = df[df["SctySrs"].str.strip().isin(SERIES[exchange])]
+        df = df.drop(columns="SctySrs").rename(columns=UDIFF_COLUMNS[exchange])
+        # One row per symbol and day, like the legacy files (the code is the first mapped column).
+        return df.drop_duplicates(next(iter(UDIFF_COLUMNS[exchange].values()))).to_csv(index=False)
+
+    def download_bhavcopy(self, last_date, to_date=None):
+        start = datetime.strptime(last_date, "%d-%m-%Y")
+        end = to_date or datetime.today()
+        jobs = [(exchange, day) for day in pd.bdate_range(start, end) for exchange in self.url_templates]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            members = list(executor.map(lambda job: self.fetch(*job), jobs))
+
+        zip_file_path = os.path.join(self.download_dir, f"{start:%Y-%m-%d}-{end:%Y-%m-%d}.zip")
+        with zipfile.ZipFile(zip_file_path, "w", zipfile.ZIP_DEFLATED) as z:
+            for (exchange, day), csv_text in zip(jobs, members):
+                if csv_text is not None:
+                    z.writestr(f"{day:%Y%m%d}_{exchange}.csv", csv_text)
+        return zip_file_path
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+OHLCV_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+TEMPLATE_NAME = 'stock_dark'
+# Default bar budget for the opt-in downsampled mode: beyond this many daily bars a chart goes weekly.
+MAX_BARS = 130
+PRICE_DECIMALS = 2
+
+# Layout every dashboard candlestick shares. It is set as explicit layout properties:
+# st.plotly_chart's default theme merges Streamlit's styling into layout.template,
+# so anything kept only in a template would be overridden.
+CHART_LAYOUT = dict(
+    plot_bgcolor="#111",
+    paper_bgcolor="#111",
+    font=dict(color='white'),
+    xaxis_title="Date",
+    yaxis_title="Price",
+    xaxis_rangeslider_visible=False,
+    showlegend=False,
+)
+# Empty template: figures carry this instead of embedding the process default
+# (plotly's or Streamlit's, several KB of JSON each).
+pio.templates[TEMPLATE_NAME] = go.layout.Template()
+
+
+def weekly_bars(agg_df):
+    # Daily OHLCV -> one bar per calendar week (Mon-Sun), placed on the week's first
+    # trading day: first open, highest high, lowest low, last close, summed volume.
+    agg_df = agg_df.dropna(subset=['open', 'high', 'low', 'close'], how='all')
+    week = agg_df['date'].dt.to_period('W')
+    bars = agg_df.groupby(week, sort=True).agg(
+        date=('date', 'first'), open=('open', 'first'), high=('high', 'max'),
+        low=('low', 'min'), close=('close', 'last'), volume=('volume', 'sum'))
+    return bars.reset_index(drop=True)
+
+
+def downsample(agg_df, max_bars=MAX_BARS):
+    # Weekly bars once the series is longer than max_bars days; shorter series pass through.
+    if max_bars is None or len(agg_df) <= max_bars:
+        return agg_df
+    return weekly_bars(agg_df)
+
+
+def _series(values, decimals=None):
+    # Plain lists serialize far smaller than numpy arrays of float32-derived doubles.
+    values = pd.Series(values)
+    if decimals is not None:
+        values = values.round(decimals)
+    return [None if pd.isna(v) else v for v in values.tolist()]
+
+
+def candlestick_figure(agg_df, title, default_zoom_days, show_volume=True, max_bars=None,
+                       height=450, margin_top=100, pad_days=5, right_padding_days=10):
+    # One dashboard chart: candles plus (optionally) volume bars on a second axis,
+    # zoomed to the last default_zoom_days. With max_bars set, long series are
+    # downsampled to weekly bars first.
+    agg_df = downsample(agg_df[OHLCV_COLUMNS].sort_values('date', ignore_index=True), max_bars)
+    # Empty days ahead of the first bar, for visual breathing room when panning left.
+    padding = pd.DataFrame({
+        'date': pd.date_range(start=agg_df['date'].min() - pd.Timedelta(days=pad_days), periods=pad_days),
+        'open': np.nan, 'high': np.nan, 'low': np.nan, 'close': np.nan, 'volume': 0
+    })
+    agg_df = pd.concat([padding, agg_df], ignore_index=True)
+    dates = agg_df['date'].dt.strftime('%Y-%m-%d').tolist()
+
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(
+        x=dates, open=_series(agg_df['open'], PRICE_DECIMALS), high=_series(agg_df['high'], PRICE_DECIMALS),
+        low=_series(agg_df['low'], PRICE_DECIMALS), close=_series(agg_df['close'], PRICE_DECIMALS),
+        name='Price', increasing_line_color='limegreen', decreasing_line_color='red'
+    ))
+    if show_volume:
+        fig.add_trace(go.Bar(
+            x=dates, y=_series(agg_df['volume'].astype('Int64')), name='Volume',
+            marker_color='rgba(135, 206, 250, 0.2)', yaxis='y2'
+        ))
+
+    last = agg_df['date'].max()
+    zoom_start = last - pd.Timedelta(days=default_zoom_days)
+    zoom_end = last + pd.Timedelta(days=right_padding_days)
+    fig.update_layout(
+        template=TEMPLATE_NAME,
+        **CHART_LAYOUT,
+        xaxis=dict(range=[zoom_start.strftime('%Y-%m-%d'), zoom_end.strftime('%Y-%m-%d')], autorange=False),
+        title=dict(text=title, x=0.5, xanchor='center'),
+        yaxis2=dict(overlaying='y', side='right', title=dict(text='Volume'), showgrid=False),
+        height=height,
+        margin=dict(t=margin_top, b=20),
+    )
+    return fig
+
+
+def payload_bytes(figures):
+    # Size of the JSON the browser receives for these figures.
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+def payload_sizes(fig):
+    # payload_bytes of a candlestick_figure with and without its volume trace (data[1]),
+    # keyed by show_volume, so a memoized figure is measured once rather than per rerun.
+    candles = go.Figure(fig)
+    candles.data = candles.data[:1]
+    return {True: payload_bytes([fig]), False: payload_bytes([candles])}
@@ -0,0 +1,54 @@
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_ROOT, "Data")
+
+# Local Parquet stores (see driver_service.ohlcv_store)
+OHLCV_STORE_DIR = os.path.join(DATA_DIR, "ohlcv_store")
+SCREENER_ARCHIVE_DIR = os.path.join(DATA_DIR, "screener_archive")
+# The dashboards sync their own read copies of the stores from Drive; server.py is the
+# only writer of the directories above, so a dashboard load never races a refresh.
+DASHBOARD_DIR = os.path.join(DATA_DIR, "dashboard")
+DASHBOARD_OHLCV_STORE_DIR = os.path.join(DASHBOARD_DIR, "ohlcv_store")
+DASHBOARD_SCREENER_ARCHIVE_DIR = os.path.join(DASHBOARD_DIR, "screener_archive")
+# Lock, log and status of the dashboard's background refresh (see driver_service.job_runner)
+REFRESH_JOB_DIR = os.path.join(DATA_DIR, "refresh_job")
+
+# Trading history kept in the OHLCV store; older partitions are retired whole.
+RETENTION_DAYS = 180
+# Drive folder retired partitions are moved to; None deletes them instead.
+DRIVE_ARCHIVE_FOLDER = None
+
+# Local copies of Drive downloads (see driver_service.drive_cache)
+DRIVE_CACHE_DIR = os.path.join(DATA_DIR, "drive_cache")
+DRIVE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+DRIVE_METADATA_PATH = os.path.join(DRIVE_CACHE_DIR, "folders.json")
+
+# read_csv schema for the legacy panel CSVs on Drive: repeated labels as categoricals
+PANEL_CSV_DTYPES = {
+    'datetime': str,
+    'NSE_BSE_code': str,
+    'Category': 'category',
+    'Industry': 'category',
+    'Mapped Sector': 'category',
+    'Sector': 'category',
+    'Sub Industry': 'category',
+    'market': 'category',
+    'Market': 'category',
+}
+
+# Reference sheets behind the security universe, and their parsed snapshots
+# (see driver_service.reference_data)
+REFERENCE_SOURCE_DIR = r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data"
+ALL_STOCK_PATH = os.path.join(REFERENCE_SOURCE_DIR, "all-stocks (2).csv")
+INDUSTRY_SECTOR_MAP_PATH = os.path.join(REFERENCE_SOURCE_DIR, "map_indus_sector.xlsx")
+SUB_INDUSTRY_MAP_PATH = os.path.join(REFERENCE_SOURCE_DIR, "sub_industry_mapping.csv")
+MARKETCAP_PATH = os.path.join(REFERENCE_SOURCE_DIR, "marketcap.csv")
+REFERENCE_SNAPSHOT_DIR = os.path.join(DATA_DIR, "reference_snapshot")
+
+# "selenium" drives the samco.in form in Chrome; "http" (opt-in, e.g. BHAVCOPY_BACKEND=http
+# in the environment) pulls the exchange archives directly
+BHAVCOPY_BACKEND = os.environ.get("BHAVCOPY_BACKEND", "selenium")
+
+# Headless browsers kept warm for the chartink screeners (see driver_service.screener)
+SCREENER_BROWSERS = 4
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from driver_service.schema import PRICE_COLUMNS
+
+# Dimensions of the dashboard cube; `date` is always the last one.
+CUBE_DIMENSIONS = ['market', 'Mapped Sector', 'Industry', 'Sub Industry', 'Category', 'date']
+SUM_COLUMNS = PRICE_COLUMNS + ['volume']
+PV_COLUMNS = [f"pv_{col}" for col in PRICE_COLUMNS]
+COUNT_COLUMNS = [f"n_{col}" for col in PRICE_COLUMNS + ['volume']]
+MEASURES = SUM_COLUMNS + PV_COLUMNS + COUNT_COLUMNS
+AGG_METHODS = ['sum', 'mean', 'weighted_avg']
+# What weighted_avg shows for a group whose volume sums to 0: the plain mean of its prices, or NaN.
+ZERO_VOLUME_POLICIES = ['mean', 'nan']
+
+
+def partials(df, by):
+    # Additive per-group partials: sums of OHLC and volume, sums of price x volume and
+    # non-null price and volume counts. Any coarser grouping is a plain sum of these rows.
+    # Rows with a missing volume add nothing to the volume or the price x volume sums.
+    prices = df[PRICE_COLUMNS].astype('float64')
+    volume = df['volume'].astype('float64')
+    measures = pd.concat([
+        prices,
+        volume.rename('volume'),
+        prices.mul(volume, axis=0).set_axis(PV_COLUMNS, axis=1),
+        pd.concat([prices, volume], axis=1).notna().astype('int64').set_axis(COUNT_COLUMNS, axis=1),
+    ], axis=1)
+    keys = [df[col] for col in by]
+    return measures.groupby(keys, observed=True, dropna=False, sort=True).sum().reset_index()
+
+
+def build_cube(df, dimensions=CUBE_DIMENSIONS):
+    # Built once per data load; every chart is then derived from this instead of raw rows.
+    return partials(df, [col for col in dimensions if col in df.columns])
+
+
+def derive(p, method, zero_volume='mean'):
+    # Partials -> OHLCV: 'sum' as is, 'mean' over non-null prices, 'weighted_avg' by volume.
+    # A weighted price is never a 0/0: zero-volume groups follow `zero_volume`, and
+    # groups without a single price stay NaN rather than a sum of nothing. A group with
+    # no known volume reports NaN volume, not 0.
+    if method not in AGG_METHODS:
+        raise ValueError(f"Unknown aggregation method {method!r}, expected one of {AGG_METHODS}")
+    if zero_volume not in ZERO_VOLUME_POLICIES:
+        raise ValueError(f"Unknown zero_volume policy {zero_volume!r}, expected one of {ZERO_VOLUME_POLICIES}")
+    keys = [col for col in p.columns if col not in MEASURES]
+    out = p[keys].copy()
+    traded = p['volume'].to_numpy() > 0
+    for col in PRICE_COLUMNS:
+        total, count, pv = (p[c].to_numpy() for c in (col, f"n_{col}", f"pv_{col}"))
+        mean = np.divide(total, count, out=np.full(len(p), np.nan), where=count > 0)
+        if method == 'sum':
+            out[col] = total
+        elif method == 'mean':
+            out[col] = mean
+        else:
+            fallback = mean if zero_volume == 'mean' else np.full(len(p), np.nan)
+            weighted = np.divide(pv, p['volume'].to_numpy(), out=fallback.copy(), where=traded & (count > 0))
+            out[col] = weighted
+    out['volume'] = p['volume'].where(p['n_volume'] > 0)
+    return out
+
+
+def _by_label(p, by):
+    # Small result frames: plain labels sorted alphabetically, whatever the category order.
+    p = p.astype({col: object for col in by if isinstance(p[col].dtype, pd.CategoricalDtype)})
+    return p.sort_values(by + ['date'], ignore_index=True)
+
+
+def ohlc_aggregate(df, by, method, zero_volume='mean'):
+    # OHLCV per (by..., date) straight from raw rows, all groups in one grouped sum.
+    p = partials(df, by + ['date']).dropna(subset=by + ['date'])
+    return derive(_by_label(p, by), method, zero_volume)
+
+
+def rollup(cube, by, method, filters=None, start=None, end=None, zero_volume='mean'):
+    # OHLCV per (by..., date) for the cube rows matching filters ({column: value},
+    # "All"/None meaning no filter) and the date range. Rows with a missing `by`
+    # label are left out, as the per-industry loops did.
+    mask = pd.Series(True, index=cube.index)
+    for col, value in (filters or {}).items():
+        if value is not None and value != "All":
+            mask &= cube[col] == value
+    if start is not None:
+        mask &= cube['date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= cube['date'] <= pd.Timestamp(end)
+    p = cube[mask].groupby(by + ['date'], observed=True, sort=True)[MEASURES].sum().reset_index()
+    return derive(_by_label(p, by), method, zero_volume)
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+
+INDEX_FILE = '_index.json'
+# An index lock older than this was left by a crashed process and is broken.
+INDEX_LOCK_STALE_SECONDS = 60
+# Cache hits only refresh last_used; they reach the index file at most this often.
+INDEX_TOUCH_FLUSH_SECONDS = 30
+
+
+@contextmanager
+def file_lock(path, timeout=30, stale=INDEX_LOCK_STALE_SECONDS):
+    # Cross-process mutex: a lock file created with O_EXCL, held only around short writes.
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# On-disk cache of Drive file contents keyed by file id + content version
+# (md5Checksum, or modifiedTime for files Drive does not checksum). Entries are
+# evicted least-recently-used first once the cache grows past max_bytes. Several
+# processes (server.py, the dashboards) share one cache: each index write happens
+# under a file lock and merges with what the others saved meanwhile. Hits only touch
+# last_used in memory; those reach the index every INDEX_TOUCH_FLUSH_SECONDS and at exit.
+class DriveCache:
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Entries this process removed since its last save; everything else on disk is kept.
+        self._dropped = set()
+        self._touched = False
+        self._saved_at = time.monotonic()
+        atexit.register(self.flush)
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def key_for(file_id, metadata):
+        version = metadata.get('md5Checksum') or metadata.get('modifiedTime') or ''
+        return hashlib.sha1(f"{file_id}:{version}".encode()).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _save_index(self):
+        index_path = self._path(INDEX_FILE)
+        with file_lock(f"{index_path}.lock"):
+            on_disk = {}
+            if os.path.exists(index_path):
+                with open(index_path) as f:
+                    on_disk = json.load(f)
+            merged = {name: entry for name, entry in on_disk.items()
+                      if name not in self._dropped and os.path.exists(self._path(name))}
+            merged.update((name, entry) for name, entry in self.index.items() if os.path.exists(self._path(name)))
+            self.index = merged
+            self._dropped.clear()
+            self._touched = False
+            self._saved_at = time.monotonic()
+            with open(f"{index_path}.tmp", 'w') as f:
+                json.dump(self.index, f)
+            os.replace(f"{index_path}.tmp", index_path)
+
+    def _lookup(self, name, count_miss=True):
+        with self._lock:
+            entry = self.index.get(name)
+            if entry is None or not os.path.exists(self._path(name)):
+                if self.index.pop(name, None) is not None:
+                    self._dropped.add(name)
+                self.misses += count_miss
+                return None
+            entry['last_used'] = time.time()
+            self.hits += 1
+            self._touched = True
+            if time.monotonic() - self._saved_at > INDEX_TOUCH_FLUSH_SECONDS:
+                self._save_index()
+            return self._path(name)
+
+    def flush(self):
+        # Writes out LRU touches (and misses) still held in memory.
+        with self._lock:
+            if self._touched or self._dropped:
+                self._save_index()
+
+    def _store(self, name, key, file_id):
+        with self._lock:
+            # A new version makes every older copy of the same Drive file unreachable.
+            for stale in [n for n, e in self.index.items() if e['file_id'] == file_id and e['key'] != key]:
+                self._remove(stale)
+            self.index[name] = {'file_id': file_id, 'key': key, 'size': os.path.getsize(self._path(name)),
+                                'last_used': time.time()}
+            self._evict()
+            self._save_index()
+
+    def _remove(self, name):
+        self.index.pop(name, None)
+        self._dropped.add(name)
+        if os.path.exists(self._path(name)):
+            os.remove(self._path(name))
+
+    def _evict(self):
+        total = sum(e['size'] for e in self.index.values())
+        for name in sorted(self.index, key=lambda n: self.index[n]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[name]['size']
+            self._remove(name)
+
+    # ---------- raw bytes ----------
+    def get_file(self, key):
+        return self._lookup(key)
+
+    def put_file(self, key, file_id, source_path, move=False):
+        (os.replace if move else shutil.copyfile)(source_path, self._path(key))
+        self._store(key, key, file_id)
+        return self._path(key)
+
+    def temp_path(self):
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        os.close(fd)
+        return path
+
+    # ---------- parsed columnar copies ----------
+    @staticmethod
+    def frame_name(key, **read_options):
+        # One parsed copy per distinct set of read_csv options (usecols, dtype, ...).
+        variant = hashlib.sha1(repr(sorted(read_options.items())).encode()).hexdigest()[:12]
+        return f"{key}-{variant}.parquet"
+
+    def get_frame(self, name):
+        # A missing parsed copy is not a miss on its own: the raw bytes may still be cached.
+        path = self._lookup(name, count_miss=False)
+        return pd.read_parquet(path) if path else None
+
+    def put_frame(self, name, key, file_id, df):
+        try:
+            df.to_parquet(self._path(name), index=False)
+        except (pa.ArrowException, ValueError):
+            # Mixed-type object columns can't be stored columnar; the raw bytes copy still serves.
+            return
+        self._store(name, key, file_id)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.index),
+            'bytes': sum(e['size'] for e in self.index.values()),
+        }
+
+
+# Name -> id lookups for Drive folders plus full per-folder listings, so repeated
+# get_or_create_folder / get_file_id_by_name calls don't each cost a files().list
+# round trip. Folder ids are persisted when `path` is given and re-resolved after
+# folder_ttl seconds, or as soon as DriveManager sees a 404 for one (forget_folder),
+# so a deleted or trashed folder is never used for good. Listings live in memory only
+# and expire after listing_ttl seconds (another process may have written to the
+# folder) or on any write through DriveManager.
+class DriveMetadataCache:
+    def __init__(self, path=None, listing_ttl=60, folder_ttl=24 * 3600):
+        self.path = path
+        self.listing_ttl = listing_ttl
+        self.folder_ttl = folder_ttl
+        self.folders = {}
+        self.listings = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.folders = json.load(f)
+
+    @staticmethod
+    def folder_key(folder_name, parent_folder_id=None):
+        return f"{parent_folder_id or 'root'}/{folder_name}"
+
+    def get_folder(self, folder_name, parent_folder_id=None):
+        entry = self.folders.get(self.folder_key(folder_name, parent_folder_id))
+        # Plain-id entries come from before folder ids expired: re-resolve those once.
+        if not isinstance(entry, dict) or time.time() - entry['resolved'] > self.folder_ttl:
+            return None
+        return entry['id']
+
+    def put_folder(self, folder_name, parent_folder_id, folder_id):
+        with self._lock:
+            self.folders[self.folder_key(folder_name, parent_folder_id)] = {
+                'id': folder_id, 'name': folder_name, 'parent': parent_folder_id, 'resolved': time.time()}
+            self._save_folders()
+
+    def forget_folder(self, folder_id):
+        # Drops every name cached for folder_id; returns the (name, parent) it was cached under, or None.
+        with self._lock:
+            self.listings.pop(folder_id, None)
+            gone = {key: entry for key, entry in self.folders.items()
+                    if isinstance(entry, dict) and entry['id'] == folder_id}
+            if not gone:
+                return None
+            for key in gone:
+                del self.folders[key]
+            self._save_folders()
+            entry = next(iter(gone.values()))
+            return entry['name'], entry['parent']
+
+    def _save_folders(self):
+        if self.path:
+            with open(f"{self.path}.tmp", 'w') as f:
+                json.dump(self.folders, f, indent=1, sort_keys=True)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def get_listing(self, folder_id):
+        entry = self.listings.get(folder_id)
+        if entry is None or time.monotonic() - entry[0] > self.listing_ttl:
+            return None
+        return entry[1]
+
+    def put_listing(self, folder_id, files):
+        self.listings[folder_id] = (time.monotonic(), files)
+
+    def invalidate(self, folder_id):
+        self.listings.pop(folder_id, None)
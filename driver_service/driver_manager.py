@@ -1,85 +1,403 @@
-import os, io
-import pandas as pd
-from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
+import os, io, json, queue, shutil, threading
+from datetime import datetime
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload, DEFAULT_CHUNK_SIZE
+from driver_service.drive_cache import DriveMetadataCache
+from driver_service.file_formats import MIME_TYPES, infer_format, write_frame, frame_to_buffer, read_frame
+
+MANIFEST_NAME = '_manifest.json'
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+# Read end of an in-flight download: MediaIoBaseDownload write()s chunks from a
+# producer thread while the parser consumes them. At most `max_chunks` chunks are
+# buffered; an optional `copy_to` file receives the raw bytes as they pass through.
+class _DownloadPipe(io.RawIOBase):
+    def __init__(self, copy_to=None, max_chunks=4):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b'')
+        self._copy_to = copy_to
+        self._error = None
+        self._aborted = threading.Event()
+
+    def readable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        if self._copy_to is not None:
+            self._copy_to.write(data)
+        while True:
+            if self._aborted.is_set():
+                raise IOError("download aborted by reader")
+            try:
+                self._chunks.put(data, timeout=0.5)
+                return len(data)
+            except queue.Full:
+                continue
+
+    def finish(self, error=None):
+        self._error = error
+        while not self._aborted.is_set():
+            try:
+                self._chunks.put(None, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def abort(self):
+        self._aborted.set()
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._chunks.put(None)
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
 
 class DriveManager:
-    def __init__(self, drive_service):
+    def __init__(self, drive_service, cache=None, metadata=None):
         self.drive_service = drive_service
+        self.cache = cache
+        self.metadata = metadata if metadata is not None else DriveMetadataCache()
+        # Folder ids that answered 404 this run -> the id their name resolves to now.
+        self._relocated = {}
 
-    def get_or_create_folder(self, folder_name, parent_folder_id=None):
-        query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+    def _folder_query(self, folder_name, parent_folder_id=None):
+        query = f"name = '{folder_name}' and mimeType = '{FOLDER_MIME}' and trashed = false"
         if parent_folder_id:
             query += f" and '{parent_folder_id}' in parents"
-        response = self.drive_service.files().list(q=query, spaces='drive', fields='files(id, name)', pageSize=1).execute()
-        folders = response.get('files', [])
-        if folders:
-            return folders[0]['id']
-        else:
-            metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}
-            if parent_folder_id:
-                metadata['parents'] = [parent_folder_id]
-            folder = self.drive_service.files().create(body=metadata, fields='id').execute()
-            return folder['id']
-
-    def upload_file(self, file_path, folder_id):
-        metadata = {'name': os.path.basename(file_path), 'parents': [folder_id]}
-        media = MediaFileUpload(file_path, resumable=True)
-        file = self.drive_service.files().create(body=metadata, media_body=media, fields='id').execute()
-        return file['id']
-
-    def upload_dataframe_as_csv(self, df, filename, folder_id):
-        df.to_csv(filename, index=False)
-        file_id = self.upload_file(filename, folder_id)
+        return self.drive_service.files().list(q=query, spaces='drive', fields='files(id, name)', pageSize=1)
+
+    def get_or_create_folder(self, folder_name, parent_folder_id=None):
+        return self.get_or_create_folders([folder_name], parent_folder_id)[folder_name]
+
+    def get_or_create_folders(self, folder_names, parent_folder_id=None):
+        # Unknown names are looked up together in one batched HTTP request.
+        ids = {name: self.metadata.get_folder(name, parent_folder_id) for name in folder_names}
+        missing = [name for name, folder_id in ids.items() if folder_id is None]
+        if missing:
+            found = {}
+
+            def collect(request_id, response, exception):
+                if exception is not None:
+                    raise exception
+                folders = response.get('files', [])
+                if folders:
+                    found[missing[int(request_id)]] = folders[0]['id']
+
+            batch = self.drive_service.new_batch_http_request(callback=collect)
+            for i, name in enumerate(missing):
+                batch.add(self._folder_query(name, parent_folder_id), request_id=str(i))
+            batch.execute()
+
+            for name in missing:
+                if name not in found:
+                    metadata = {'name': name, 'mimeType': FOLDER_MIME}
+                    if parent_folder_id:
+                        metadata['parents'] = [parent_folder_id]
+                    found[name] = self.drive_service.files().create(body=metadata, fields='id').execute()['id']
+                    if parent_folder_id:
+                        self.metadata.invalidate(parent_folder_id)
+                self.metadata.put_folder(name, parent_folder_id, found[name])
+                ids[name] = found[name]
+        return ids
+
+    def _folder(self, folder_id):
+        return self._relocated.get(folder_id, folder_id)
+
+    def _in_folder(self, folder_id, call):
+        # Runs call(folder_id). A 404 means the cached folder id is stale (the folder was
+        # deleted): forget it, resolve the folder's name again and retry once.
+        folder_id = self._folder(folder_id)
+        try:
+            return call(folder_id)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            located = self.metadata.forget_folder(folder_id)
+            if located is None:
+                raise
+            new_id = self.get_or_create_folder(*located)
+            if new_id == folder_id:
+                raise
+            self._relocated[folder_id] = new_id
+            return call(new_id)
+
+    def _create_in(self, folder_id, name, media):
+        def create(parent_id):
+            metadata = {'name': name, 'parents': [parent_id]}
+            return self.drive_service.files().create(body=metadata, media_body=media, fields='id').execute()['id']
+
+        file_id = self._in_folder(folder_id, create)
+        self.metadata.invalidate(self._folder(folder_id))
+        return file_id
+
+    def upload_file(self, file_path, folder_id, mimetype=None):
+        media = MediaFileUpload(file_path, mimetype=mimetype, resumable=True)
+        return self._create_in(folder_id, os.path.basename(file_path), media)
+
+    def upload_dataframe_as_csv(self, df, filename, folder_id, fmt=None):
+        fmt = infer_format(filename, fmt)
+        write_frame(df, filename, fmt)
+        file_id = self.upload_file(filename, folder_id, mimetype=MIME_TYPES[fmt])
         os.remove(filename)
         return file_id
 
-    def upload_dataframe_in_memory(self, df, filename, folder_id):
-        buffer = io.BytesIO()
-        df.to_csv(buffer, index=False)
-        buffer.seek(0)
-        metadata = {'name': filename, 'parents': [folder_id]}
-        media = MediaIoBaseUpload(buffer, mimetype='text/csv')
-        file = self.drive_service.files().create(body=metadata, media_body=media, fields='id').execute()
-        return file['id']
-
-    def download_file(self, file_id, destination_path):
+    def upload_dataframe_in_memory(self, df, filename, folder_id, fmt=None):
+        fmt = infer_format(filename, fmt)
+        buffer = frame_to_buffer(df, fmt)
+        media = MediaIoBaseUpload(buffer, mimetype=MIME_TYPES[fmt])
+        return self._create_in(folder_id, filename, media)
+
+    def _download_to(self, file_id, fh, chunksize=DEFAULT_CHUNK_SIZE):
         request = self.drive_service.files().get_media(fileId=file_id)
+        downloader = MediaIoBaseDownload(fh, request, chunksize=chunksize)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+
+    def cache_key(self, file_id, metadata=None):
+        # metadata: the file's listing entry (md5Checksum / modifiedTime) when the caller
+        # already has one; otherwise a metadata-only round trip tells whether the cached
+        # copy is still current.
+        if metadata is None:
+            metadata = self.drive_service.files().get(fileId=file_id, fields='md5Checksum, modifiedTime').execute()
+        return self.cache.key_for(file_id, metadata)
+
+    def download_file(self, file_id, destination_path, metadata=None):
+        if self.cache is None:
+            with io.FileIO(destination_path, 'wb') as fh:
+                self._download_to(file_id, fh)
+            return
+
+        key = self.cache_key(file_id, metadata)
+        cached = self.cache.get_file(key)
+        if cached:
+            shutil.copyfile(cached, destination_path)
+            return
         with io.FileIO(destination_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+            self._download_to(file_id, fh)
+        self.cache.put_file(key, file_id, destination_path)
 
-    def get_file_id_by_name(self, file_name, parent_folder_id=None):
-        query = f"name = '{file_name}' and mimeType = 'text/csv' and trashed = false"
+    def find_file(self, file_name, parent_folder_id=None, mime_type='text/csv'):
+        # The file's listing entry (id, name, mimeType, md5Checksum, modifiedTime), or None.
         if parent_folder_id:
-            query += f" and '{parent_folder_id}' in parents"
-        response = self.drive_service.files().list(q=query, spaces='drive', fields='files(id, name)', pageSize=1).execute()
+            # Served from the folder listing; the newest file wins if a name was uploaded twice.
+            matches = [f for f in self.list_files_in_folder(parent_folder_id)
+                       if f['name'] == file_name and (not mime_type or f['mimeType'] == mime_type)]
+            matches.sort(key=lambda f: f.get('modifiedTime', ''), reverse=True)
+            return matches[0] if matches else None
+
+        query = f"name = '{file_name}' and trashed = false"
+        if mime_type:
+            query += f" and mimeType = '{mime_type}'"
+        response = self.drive_service.files().list(q=query, spaces='drive', pageSize=1,
+                                                   fields='files(id, name, mimeType, md5Checksum, modifiedTime)').execute()
         files = response.get('files', [])
-        return files[0]['id'] if files else None
+        return files[0] if files else None
 
-    def fetch_csv_by_name_as_dataframe(self, file_name, parent_folder_id=None):
-        file_id = self.get_file_id_by_name(file_name, parent_folder_id)
-        if file_id is None:
+    def get_file_id_by_name(self, file_name, parent_folder_id=None, mime_type='text/csv'):
+        file = self.find_file(file_name, parent_folder_id, mime_type)
+        return file['id'] if file else None
+
+    def _stream_frame(self, file_id, fmt, copy_to=None, **read_options):
+        if fmt == 'parquet':
+            # Parquet needs its footer before any column can be decoded, so it is read whole.
+            buffer = io.BytesIO()
+            self._download_to(file_id, buffer)
+            if copy_to is not None:
+                copy_to.write(buffer.getbuffer())
+            buffer.seek(0)
+            return read_frame(buffer, fmt, **read_options)
+
+        # CSV (plain or gzip) chunks are parsed while later chunks are still in flight.
+        pipe = _DownloadPipe(copy_to)
+
+        def produce():
+            try:
+                self._download_to(file_id, pipe, chunksize=STREAM_CHUNK_SIZE)
+            except BaseException as e:
+                pipe.finish(e)
+            else:
+                pipe.finish()
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            return read_frame(io.BufferedReader(pipe, buffer_size=1 << 20), fmt, **read_options)
+        finally:
+            pipe.abort()
+            producer.join()
+
+    def fetch_csv_by_name_as_dataframe(self, file_name, parent_folder_id=None, usecols=None, dtype=None, fmt=None):
+        # Despite the name, also reads the gzip-CSV and Parquet variants (see file_formats).
+        fmt = infer_format(file_name, fmt)
+        file = self.find_file(file_name, parent_folder_id, mime_type=MIME_TYPES[fmt])
+        if file is None:
             return None
-        request = self.drive_service.files().get_media(fileId=file_id)
-        buffer = io.BytesIO()
-        downloader = MediaIoBaseDownload(buffer, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-        buffer.seek(0)
-        return pd.read_csv(buffer)
+        file_id = file['id']
+        read_options = {'usecols': usecols, 'dtype': dtype}
+        if self.cache is None:
+            return self._stream_frame(file_id, fmt, **read_options)
 
+        key = self.cache_key(file_id, file)
+        frame_name = self.cache.frame_name(key, fmt=fmt, **read_options)
+        df = self.cache.get_frame(frame_name)
+        if df is not None:
+            return df
+        cached = self.cache.get_file(key)
+        if cached:
+            df = read_frame(cached, fmt, **read_options)
+        else:
+            temp_path = self.cache.temp_path()
+            try:
+                with open(temp_path, 'wb') as copy_to:
+                    df = self._stream_frame(file_id, fmt, copy_to, **read_options)
+                self.cache.put_file(key, file_id, temp_path, move=True)
+            finally:
+                # Moved into the cache on success; a failed download or parse leaves it behind.
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self.cache.put_frame(frame_name, key, file_id, df)
+        return df
 
-    def list_files_in_folder(self, folder_id):
-        query = f"'{folder_id}' in parents and trashed = false"
-        results = self.drive_service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name, mimeType, modifiedTime, size)',
-            pageSize=1000
-        ).execute()
+    def list_files_in_folder(self, folder_id, refresh=False):
+        folder_id = self._folder(folder_id)
+        files = None if refresh else self.metadata.get_listing(folder_id)
+        if files is not None:
+            return files
 
-        files = results.get('files', [])
+        def list_all(folder_id):
+            query = f"'{folder_id}' in parents and trashed = false"
+            files, page_token = [], None
+            while True:
+                results = self.drive_service.files().list(
+                    q=query,
+                    spaces='drive',
+                    fields='nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime, size)',
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                files.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    return files
+
+        files = self._in_folder(folder_id, list_all)
+        self.metadata.put_listing(self._folder(folder_id), files)
         return files
+
+    # ---------- Partitioned uploads ----------
+    # Each store partition is its own Drive file; `_manifest.json` in the folder maps
+    # the partition path to its file id and catalog entry (rows, dates, md5), and keeps
+    # tombstones (`retired`: rel_path -> date) for partitions taken out on purpose.
+    def get_manifest(self, folder_id):
+        file_id = self.get_file_id_by_name(MANIFEST_NAME, folder_id, mime_type='application/json')
+        if file_id is None:
+            return {'partitions': {}}, None
+        buffer = io.BytesIO()
+        self._download_to(file_id, buffer)
+        return json.loads(buffer.getvalue()), file_id
+
+    def put_manifest(self, manifest, folder_id, file_id=None):
+        buffer = io.BytesIO(json.dumps(manifest, indent=1, sort_keys=True).encode())
+        media = MediaIoBaseUpload(buffer, mimetype='application/json')
+        if file_id:
+            self.drive_service.files().update(fileId=file_id, media_body=media).execute()
+            self.metadata.invalidate(self._folder(folder_id))
+            return file_id
+        return self._create_in(folder_id, MANIFEST_NAME, media)
+
+    def upload_partitions(self, local_root, partitions, folder_id, replaces=()):
+        # partitions: {rel_path: catalog entry}. Existing partitions are updated in place
+        # so a re-ingested day never leaves a second file with the same name behind.
+        # `replaces` are retired in the same manifest write (e.g. the daily files of a
+        # compacted month), so no reader ever sees both the new file and the old ones.
+        manifest, manifest_id = self.get_manifest(folder_id)
+        changed = bool(replaces)
+        for rel_path, entry in partitions.items():
+            known = manifest['partitions'].get(rel_path)
+            if known and known.get('md5') == entry.get('md5'):
+                continue
+            changed = True
+            media = MediaFileUpload(os.path.join(local_root, rel_path), mimetype=MIME_TYPES['parquet'], resumable=True)
+            if known:
+                self.drive_service.files().update(fileId=known['id'], media_body=media).execute()
+                file_id = known['id']
+            else:
+                file_id = self._create_in(folder_id, rel_path.replace('/', '__'), media)
+            manifest['partitions'][rel_path] = dict(entry, id=file_id)
+            manifest.get('retired', {}).pop(rel_path, None)
+        retired = self._tombstone(manifest, replaces)
+        if changed:
+            self.put_manifest(manifest, folder_id, manifest_id)
+        self._dispose(retired, folder_id)
+        return manifest
+
+    def _tombstone(self, manifest, rel_paths):
+        # Marks rel_paths retired in `manifest` and returns the entries taken out of it.
+        retired = manifest.setdefault('retired', {})
+        entries = []
+        for rel_path in rel_paths:
+            retired[rel_path] = datetime.today().strftime('%Y-%m-%d')
+            entry = manifest['partitions'].pop(rel_path, None)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def _dispose(self, entries, folder_id, archive_folder_id=None):
+        # Files of retired partitions, once the manifest no longer lists them: moved to
+        # archive_folder_id when one is given (reparenting only, no re-upload), else deleted.
+        folder_id = self._folder(folder_id)
+        archive_folder_id = archive_folder_id and self._folder(archive_folder_id)
+        for entry in entries:
+            if archive_folder_id:
+                self.drive_service.files().update(fileId=entry['id'], addParents=archive_folder_id,
+                                                  removeParents=folder_id, fields='id').execute()
+            else:
+                self.drive_service.files().delete(fileId=entry['id']).execute()
+        if entries:
+            self.metadata.invalidate(folder_id)
+            if archive_folder_id:
+                self.metadata.invalidate(archive_folder_id)
+
+    def retire_partitions(self, rel_paths, folder_id, archive_folder_id=None):
+        # Takes partitions out of the manifest, then archives or deletes their files.
+        if not rel_paths:
+            return
+        manifest, manifest_id = self.get_manifest(folder_id)
+        retired = self._tombstone(manifest, rel_paths)
+        self.put_manifest(manifest, folder_id, manifest_id)
+        self._dispose(retired, folder_id, archive_folder_id)
+
+    def download_partitions(self, folder_id, local_root, have):
+        # Fetches only partitions that are missing locally or whose content changed.
+        # Local partitions the manifest retired come back as None; ones it simply
+        # doesn't list yet (written locally, not published) are left alone.
+        manifest, _ = self.get_manifest(folder_id)
+        fetched = {rel_path: None for rel_path in have
+                   if rel_path in manifest.get('retired', {}) and rel_path not in manifest['partitions']}
+        listing = None
+        for rel_path, entry in manifest['partitions'].items():
+            local = have.get(rel_path)
+            if local and local.get('md5') == entry.get('md5'):
+                continue
+            if listing is None:
+                # One fresh folder listing versions every changed partition for the cache,
+                # rather than a metadata call per file.
+                listing = {f['id']: f for f in self.list_files_in_folder(folder_id, refresh=True)}
+            destination = os.path.join(local_root, rel_path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            self.download_file(entry['id'], destination, metadata=listing.get(entry['id']))
+            fetched[rel_path] = {k: v for k, v in entry.items() if k != 'id'}
+        return fetched
@@ -0,0 +1,49 @@
+import io
+import pandas as pd
+
+# Transfer formats for DataFrames moved to and from Drive. The format comes from
+# an explicit `fmt` argument or, failing that, from the file name's extension.
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'csv.gz': 'application/gzip',
+    'parquet': 'application/vnd.apache.parquet',
+}
+PARQUET_COMPRESSION = 'zstd'
+
+
+def infer_format(file_name, fmt=None):
+    if fmt is not None:
+        if fmt not in MIME_TYPES:
+            raise ValueError(f"Unsupported format {fmt!r}, expected one of {sorted(MIME_TYPES)}")
+        return fmt
+    name = file_name.lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith('.csv.gz') or name.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+
+def write_frame(df, target, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(target, index=False, compression=PARQUET_COMPRESSION)
+    elif fmt == 'csv.gz':
+        df.to_csv(target, index=False, compression={'method': 'gzip', 'compresslevel': 6, 'mtime': 0})
+    else:
+        df.to_csv(target, index=False)
+
+
+def frame_to_buffer(df, fmt):
+    buffer = io.BytesIO()
+    write_frame(df, buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+def read_frame(source, fmt, usecols=None, dtype=None):
+    if fmt == 'parquet':
+        df = pd.read_parquet(source, columns=usecols)
+        # Parquet already carries column types; only the categorical hints still apply.
+        categorical = {col: 'category' for col, kind in (dtype or {}).items() if kind == 'category' and col in df.columns}
+        return df.astype(categorical) if categorical else df
+    return pd.read_csv(source, usecols=usecols, dtype=dtype, compression='gzip' if fmt == 'csv.gz' else None)
@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from driver_service.constant import PROJECT_ROOT
+
+LOCK_FILE = 'refresh.lock'
+LOG_FILE = 'refresh.log'
+STATUS_FILE = 'status.json'
+# The running job touches its lock this often; a lock untouched for LOCK_STALE_SECONDS
+# belongs to a runner that died (killed, machine restarted) and may be broken.
+HEARTBEAT_SECONDS = 10
+LOCK_STALE_SECONDS = 120
+
+# Lines the job prints to report progress; everything else is plain log output.
+STAGE_MARKER = '::stage::'
+UPDATED_MARKER = '::updated::'
+# server.py's stages in order; a current store skips straight from retention to done.
+REFRESH_STAGES = ['sync', 'retention', 'bhavcopy', 'ohlcv', 'screeners', 'done']
+
+
+def report_stage(name):
+    print(f"{STAGE_MARKER} {name}", flush=True)
+
+
+def report_updated(dataset):
+    # Tells the dashboard which cached dataset ('panel', 'screeners') the job changed.
+    print(f"{UPDATED_MARKER} {dataset}", flush=True)
+
+
+# One refresh at a time across every dashboard session and process:
+#   job_dir/refresh.lock   created with O_EXCL by start(), heartbeated and removed by the runner
+#   job_dir/refresh.log    the job's output, one timestamped line at a time
+#   job_dir/status.json    state, current stage and updated datasets of the latest job
+# The job itself runs under `python -m driver_service.job_runner`, detached from
+# the Streamlit process, so a dashboard restart neither kills nor orphans it.
+class RefreshJob:
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        os.makedirs(job_dir, exist_ok=True)
+        self.lock_path = os.path.join(job_dir, LOCK_FILE)
+        self.log_path = os.path.join(job_dir, LOG_FILE)
+        self.status_path = os.path.join(job_dir, STATUS_FILE)
+
+    # ---------- lock ----------
+    def _lock_age(self):
+        try:
+            return time.time() - os.path.getmtime(self.lock_path)
+        except FileNotFoundError:
+            return None
+
+    def is_running(self):
+        age = self._lock_age()
+        return age is not None and age < LOCK_STALE_SECONDS
+
+    def _acquire(self, job_id):
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.is_running():
+                    return False
+                # Stale: its runner is gone without releasing it.
+                try:
+                    os.remove(self.lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'job_id': job_id, 'pid': os.getpid()}, f)
+            return True
+        return False
+
+    def _release(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    # ---------- status ----------
+    def _write_status(self, status):
+        with open(f"{self.status_path}.tmp", 'w') as f:
+            json.dump(status, f, indent=1)
+        os.replace(f"{self.status_path}.tmp", self.status_path)
+
+    def status(self):
+        # Latest job's status, or None if no job ever ran. A job still marked running
+        # whose lock is gone or stale ended without reporting: 'interrupted'.
+        try:
+            with open(self.status_path) as f:
+                status = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if status['state'] == 'running' and not self.is_running():
+            status['state'] = 'interrupted'
+        return status
+
+    def progress(self, status):
+        # Fraction of REFRESH_STAGES reached, for a progress bar.
+        if status['state'] != 'running':
+            return 1.0
+        if status.get('stage') not in REFRESH_STAGES:
+            return 0.0
+        return REFRESH_STAGES.index(status['stage']) / (len(REFRESH_STAGES) - 1)
+
+    def log_tail(self, lines=30):
+        try:
+            with open(self.log_path, encoding='utf-8', errors='replace') as f:
+                return ''.join(f.readlines()[-lines:])
+        except FileNotFoundError:
+            return ''
+
+    # ---------- running ----------
+    def start(self, command):
+        # Launches command in the background and returns its job id, or None when a
+        # refresh is already running (single flight: the caller just watches that one).
+        job_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        if not self._acquire(job_id):
+            return None
+        self._write_status({'job_id': job_id, 'state': 'running', 'stage': None, 'updated': [],
+                            'command': command, 'started': datetime.now().isoformat(timespec='seconds'),
+                            'finished': None, 'returncode': None})
+        # Own session / process group: the job outlives the dashboard process that started it.
+        detach = ({'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS}
+                  if os.name == 'nt' else {'start_new_session': True})
+        try:
+            subprocess.Popen([sys.executable, '-m', 'driver_service.job_runner', self.job_dir, job_id, '--']
+                             + list(command), cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **detach)
+        except Exception:
+            self._release()
+            raise
+        return job_id
+
+    def run(self, job_id, command):
+        # Runner side of start(): streams the job's output into the log, tracks its
+        # markers in status.json, heartbeats the lock and releases it at the end.
+        status = self.status() or {}
+        status.update(job_id=job_id, state='running', stage=None, updated=[], command=command)
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(HEARTBEAT_SECONDS):
+                try:
+                    os.utime(self.lock_path)
+                except FileNotFoundError:
+                    return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+        try:
+            with open(self.log_path, 'w', encoding='utf-8') as log:
+                proc = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                for raw in proc.stdout:
+                    line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                    log.write(f"{datetime.now():%H:%M:%S} {line}\n")
+                    log.flush()
+                    if line.startswith(STAGE_MARKER):
+                        status['stage'] = line[len(STAGE_MARKER):].strip()
+                        self._write_status(status)
+                    elif line.startswith(UPDATED_MARKER):
+                        dataset = line[len(UPDATED_MARKER):].strip()
+                        if dataset not in status['updated']:
+                            status['updated'].append(dataset)
+                            self._write_status(status)
+                returncode = proc.wait()
+            status.update(state='succeeded' if returncode == 0 else 'failed', returncode=returncode)
+        except Exception as e:
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(f"{datetime.now():%H:%M:%S} ❌ Refresh runner failed: {e}\n")
+            status.update(state='failed')
+        finally:
+            status['finished'] = datetime.now().isoformat(timespec='seconds')
+            self._write_status(status)
+            stop.set()
+            self._release()
+        return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a refresh job started by RefreshJob.start()")
+    parser.add_argument('job_dir')
+    parser.add_argument('job_id')
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    RefreshJob(args.job_dir).run(args.job_id, command)
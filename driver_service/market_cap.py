@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+CAP_LABELS = np.array(['Large-cap', 'Mid-cap', 'Small-cap'], dtype=object)
+
+# Top 100 by market cap are Large-cap, the next 150 Mid-cap, everything else Small-cap.
+UNIVERSE_CUTOFFS = (100, 250)
+
+
+def cap_rank(mcap, groups=None):
+    # 0-based position in descending market-cap order (within each group when
+    # given). Ties keep their original row order, as the per-row loops did.
+    mcap = pd.Series(mcap)
+    if groups is None:
+        return mcap.rank(ascending=False, method='first') - 1
+    return mcap.groupby(pd.Series(groups, index=mcap.index)).rank(ascending=False, method='first') - 1
+
+
+def universe_categories(mcap, cutoffs=UNIVERSE_CUTOFFS):
+    # Fixed rank cutoffs over the whole universe; rows without a market cap are Small-cap.
+    pos = cap_rank(mcap).to_numpy()
+    labels = CAP_LABELS[np.select([pos < cutoffs[0], pos < cutoffs[1]], [0, 1], 2)]
+    return pd.Series(labels, index=pd.Series(mcap).index)
+
+
+def group_tercile_categories(mcap, groups):
+    # Per-group terciles: position i of n is Large-cap for i < n/3, Mid-cap for
+    # i < 2n/3, Small-cap otherwise. Rows missing the cap or the group get NaN.
+    mcap = pd.Series(mcap)
+    groups = pd.Series(groups, index=mcap.index)
+    valid = mcap.notna() & groups.notna()
+    pos = cap_rank(mcap[valid], groups[valid]).to_numpy()
+    n = groups[valid].map(groups[valid].value_counts()).to_numpy()
+    labels = CAP_LABELS[np.select([pos < n / 3, pos < 2 * n / 3], [0, 1], 2)]
+    return pd.Series(labels, index=mcap.index[valid]).reindex(mcap.index)
@@ -0,0 +1,339 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from driver_service.file_formats import PARQUET_COMPRESSION
+from driver_service.schema import SCHEMA_VERSION, conform, is_canonical, to_frame, to_table, trade_dates
+
+CATALOG_FILE = '_catalog.json'
+# Industry label process_all_stock gives securities missing from the sector mapping.
+UNMAPPED_INDUSTRY = 'BhaPra'
+# A trading day counts as fully ingested once this many mapped symbols have a bar.
+COMPLETE_DAY_SYMBOLS = 4000
+# Daily partitions of a month are merged once the month ends this many days before the latest date.
+COMPACT_AFTER_DAYS = 31
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Parquet files partitioned by market and trade date under `root`:
+#   root/<market>/<YYYY-MM-DD>.parquet   (one trading day)
+#   root/<market>/<YYYY-MM>.parquet      (a closed month, see compact)
+# `_catalog.json` records every partition file with its market, date span and
+# row count so reads can prune files without listing or opening them. It also
+# keeps a coverage manifest, {date: {market: distinct mapped symbols}}, plus the
+# latest date whose total reaches complete_symbols, so finding where ingestion
+# should resume is a lookup rather than a scan of the full history.
+class OHLCVStore:
+    def __init__(self, root, market_col='market', date_col='date', symbol_col='NSE_BSE_code',
+                 complete_symbols=COMPLETE_DAY_SYMBOLS):
+        self.root = root
+        self.market_col = market_col
+        self.date_col = date_col
+        self.symbol_col = symbol_col
+        self.complete_symbols = complete_symbols
+        os.makedirs(root, exist_ok=True)
+        self.catalog = self._load_catalog()
+        if 'coverage' not in self.catalog or self.catalog.get('complete_symbols') != complete_symbols:
+            self.rebuild_coverage()
+        if self.catalog.get('schema') != SCHEMA_VERSION:
+            self.migrate_schema()
+
+    def _load_catalog(self):
+        path = os.path.join(self.root, CATALOG_FILE)
+        if not os.path.exists(path):
+            return {'partitions': {}, 'coverage': {}, 'last_complete': None, 'complete_symbols': self.complete_symbols,
+                    'schema': SCHEMA_VERSION}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_catalog(self):
+        path = os.path.join(self.root, CATALOG_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(self.catalog, f, indent=1, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def partitions(self):
+        return self.catalog['partitions']
+
+    def is_empty(self):
+        return not self.partitions
+
+    def with_trade_date(self, df):
+        # Frames still carrying the legacy ISO `datetime` string get their trade date from it.
+        if self.date_col not in df.columns:
+            df = df.assign(**{self.date_col: trade_dates(df['datetime'])})
+        return df
+
+    def _read_file(self, rel_path, columns=None):
+        return to_frame(pq.read_table(os.path.join(self.root, rel_path), columns=columns))
+
+    def _conform_file(self, rel_path):
+        if not is_canonical(pq.read_schema(os.path.join(self.root, rel_path))):
+            self._write(rel_path, conform(self._read_file(rel_path)), self.partitions[rel_path]['market'])
+
+    def migrate_schema(self):
+        # One-time rewrite of partitions stored before the canonical schema (ISO
+        # datetime strings, float64 prices, plain string dimensions).
+        for rel_path in list(self.partitions):
+            self._conform_file(rel_path)
+        self.catalog['schema'] = SCHEMA_VERSION
+        self._save_catalog()
+
+    # ---------- coverage ----------
+    def symbol_counts(self, df):
+        # Distinct mapped symbols per trade date, as {YYYY-MM-DD: n}.
+        df = self.with_trade_date(df)
+        if 'Industry' in df.columns:
+            df = df[df['Industry'] != UNMAPPED_INDUSTRY]
+        counts = df.groupby(pd.to_datetime(df[self.date_col]).dt.strftime('%Y-%m-%d'))[self.symbol_col].nunique()
+        return {day: int(n) for day, n in counts.items()}
+
+    def _partition_coverage(self, rel_path, entry):
+        if 'coverage' not in entry:
+            # Partitions published before coverage was tracked: count them once from the file.
+            schema = pq.read_schema(os.path.join(self.root, rel_path))
+            columns = [c for c in (self.date_col, self.symbol_col, 'Industry', 'datetime') if c in schema.names]
+            entry['coverage'] = self.symbol_counts(self._read_file(rel_path, columns))
+        return entry['coverage']
+
+    def _set_coverage(self, market, counts):
+        coverage = self.catalog['coverage']
+        for day, n in counts.items():
+            coverage.setdefault(day, {})[str(market)] = n
+            total = sum(coverage[day].values())
+            last = self.catalog['last_complete']
+            if total >= self.complete_symbols and (last is None or day > last):
+                self.catalog['last_complete'] = day
+            elif day == last and total < self.complete_symbols:
+                self._find_last_complete()
+
+    def _drop_coverage(self, market, counts):
+        coverage = self.catalog['coverage']
+        for day in counts:
+            coverage.get(day, {}).pop(str(market), None)
+            if not coverage.get(day, True):
+                del coverage[day]
+        if self.catalog['last_complete'] in counts:
+            self._find_last_complete()
+
+    def _find_last_complete(self):
+        complete = [day for day, markets in self.catalog['coverage'].items()
+                    if sum(markets.values()) >= self.complete_symbols]
+        self.catalog['last_complete'] = max(complete) if complete else None
+
+    def rebuild_coverage(self):
+        self.catalog.update(coverage={}, last_complete=None, complete_symbols=self.complete_symbols)
+        for rel_path, entry in self.partitions.items():
+            self._set_coverage(entry['market'], self._partition_coverage(rel_path, entry))
+        self._save_catalog()
+
+    def coverage(self, day):
+        return dict(self.catalog['coverage'].get(pd.Timestamp(day).strftime('%Y-%m-%d'), {}))
+
+    def last_complete_date(self):
+        # Latest trade date (YYYY-MM-DD) with at least complete_symbols mapped symbols, or None.
+        return self.catalog['last_complete']
+
+    # ---------- partitions ----------
+    def write_partition(self, df, market, trade_date):
+        day = pd.Timestamp(trade_date).strftime('%Y-%m-%d')
+        return self._write(f"{market}/{day}.parquet", df, market)
+
+    def _write(self, rel_path, df, market):
+        # (Re)writes one partition file and its catalog entry; the date span comes from df.
+        os.makedirs(os.path.join(self.root, str(market)), exist_ok=True)
+        table = to_table(df)
+        path = os.path.join(self.root, rel_path)
+        pq.write_table(table, f"{path}.tmp", compression=PARQUET_COMPRESSION)
+        os.replace(f"{path}.tmp", path)
+        old = self.partitions.get(rel_path)
+        if old is not None:
+            self._drop_coverage(market, old.get('coverage', {}))
+        days = pd.to_datetime(df[self.date_col])
+        self.partitions[rel_path] = {'market': str(market), 'start': days.min().strftime('%Y-%m-%d'),
+                                     'end': days.max().strftime('%Y-%m-%d'), 'rows': len(df),
+                                     'md5': file_md5(path), 'coverage': self.symbol_counts(df)}
+        self._set_coverage(market, self.partitions[rel_path]['coverage'])
+        return rel_path
+
+    def register(self, partitions):
+        # Adds partition files placed under root by someone else (e.g. a Drive download).
+        # A None entry means the partition was removed upstream (retention or compaction).
+        if partitions:
+            self.forget([rel_path for rel_path, entry in partitions.items() if entry is None])
+            for rel_path, entry in partitions.items():
+                if entry is not None:
+                    self.partitions[rel_path] = entry
+                    self._set_coverage(entry['market'], self._partition_coverage(rel_path, entry))
+                    # Files published before the canonical schema are rewritten on arrival.
+                    self._conform_file(rel_path)
+            self._save_catalog()
+
+    def forget(self, rel_paths):
+        # Removes partitions from the catalog and from disk.
+        for rel_path in rel_paths:
+            entry = self.partitions.pop(rel_path, None)
+            if entry is None:
+                continue
+            self._drop_coverage(entry['market'], entry.get('coverage', {}))
+            path = os.path.join(self.root, rel_path)
+            if os.path.exists(path):
+                os.remove(path)
+        if rel_paths:
+            self._save_catalog()
+
+    def append(self, df):
+        # Writes (or replaces) one partition per (market, trade date) present in df.
+        df = self.with_trade_date(df)
+        written = []
+        for (market, trade_date), part in df.groupby([self.market_col, self.date_col], sort=True):
+            written.append(self.write_partition(part, market, trade_date))
+        self._save_catalog()
+        return written
+
+    def _keys(self, df):
+        # (symbol, trade date) as strings, so int BSE codes match their stored str form.
+        return pd.MultiIndex.from_arrays([df[self.symbol_col].astype(str),
+                                          pd.to_datetime(df[self.date_col]).dt.strftime('%Y-%m-%d')])
+
+    def upsert(self, df):
+        # Inserts or replaces rows keyed on (symbol, trade date), last row wins, as
+        # concat + drop_duplicates(keep='last') did over the whole history. Only the
+        # partitions covering df's dates are read and rewritten.
+        # Returns {'inserted': n, 'updated': n, 'written': [rel_path, ...]}.
+        df = self.with_trade_date(df)
+        df = df[~self._keys(df).duplicated(keep='last')]
+        if df.empty:
+            return {'inserted': 0, 'updated': 0, 'written': []}
+        keys = self._keys(df)
+        days = set(keys.get_level_values(1))
+        markets = df[self.market_col].astype(str)
+
+        matched = pd.Series(False, index=df.index)
+        routed = pd.Series(False, index=df.index)
+        written = []
+        for rel_path, entry in sorted(self.partitions.items()):
+            if not any(entry['start'] <= day <= entry['end'] for day in days):
+                continue
+            existing = self._read_file(rel_path)
+            hit = self._keys(existing).isin(keys)
+            matched |= keys.isin(self._keys(existing[hit]))
+            # Incoming rows of this market whose date falls in the file's span are written back into it.
+            incoming = (markets == entry['market']).to_numpy() & (keys.get_level_values(1) >= entry['start']) \
+                & (keys.get_level_values(1) <= entry['end']) & ~routed.to_numpy()
+            if not hit.any() and not incoming.any():
+                continue
+            routed |= incoming
+            merged = pd.concat([existing[~hit], df[incoming]], ignore_index=True)
+            if merged.empty:
+                self.forget([rel_path])
+            else:
+                written.append(self._write(rel_path, merged, entry['market']))
+
+        for (market, trade_date), part in df[~routed].groupby([self.market_col, self.date_col], sort=True):
+            written.append(self.write_partition(part, market, trade_date))
+        self._save_catalog()
+        return {'inserted': int((~matched).sum()), 'updated': int(matched.sum()), 'written': written}
+
+    # ---------- retention / compaction ----------
+    def latest_date(self):
+        return max((p['end'] for p in self.partitions.values()), default=None)
+
+    def retention_cutoff(self, days_to_keep):
+        # Oldest trade date still inside a days_to_keep window ending at the latest stored date.
+        latest = self.latest_date()
+        if latest is None:
+            return None
+        return (pd.Timestamp(latest) - pd.Timedelta(days=days_to_keep)).strftime('%Y-%m-%d')
+
+    def apply_retention(self, days_to_keep, archive=None):
+        # Drops whole partitions that end before the cutoff; only catalog entries are
+        # inspected, so the cost follows the expired files rather than the history.
+        # `archive(rel_path, entry)` is called for each one before it is removed.
+        # A compacted file straddling the cutoff is kept; read(start=cutoff) trims it.
+        cutoff = self.retention_cutoff(days_to_keep)
+        expired = [rel_path for rel_path, p in self.partitions.items() if cutoff is not None and p['end'] < cutoff]
+        if archive is not None:
+            for rel_path in expired:
+                archive(rel_path, self.partitions[rel_path])
+        self.forget(expired)
+        return expired
+
+    def compact(self, keep_recent_days=COMPACT_AFTER_DAYS):
+        # Merges each market's files for a closed month into <market>/<YYYY-MM>.parquet.
+        # Months within keep_recent_days of the latest date stay daily so a re-ingested
+        # day still just replaces its own file. Returns (written, replaced) rel paths.
+        latest = self.latest_date()
+        if latest is None:
+            return [], []
+        horizon = (pd.Timestamp(latest) - pd.Timedelta(days=keep_recent_days)).strftime('%Y-%m')
+        groups = {}
+        for rel_path, p in self.partitions.items():
+            month = p['start'][:7]
+            if p['end'][:7] == month and month < horizon:
+                groups.setdefault((p['market'], month), []).append(rel_path)
+
+        written, replaced = [], []
+        for (market, month), rel_paths in sorted(groups.items()):
+            target = f"{market}/{month}.parquet"
+            if len(rel_paths) < 2:
+                continue
+            paths = [os.path.join(self.root, p) for p in sorted(rel_paths)]
+            schema = pa.unify_schemas([pq.read_schema(p) for p in paths], promote_options='permissive')
+            table = ds.dataset(paths, schema=schema, format='parquet').to_table().sort_by(self.date_col)
+            entries = [self.partitions[p] for p in rel_paths]
+            coverage = {}
+            for rel_path in rel_paths:
+                coverage.update(self._partition_coverage(rel_path, self.partitions[rel_path]))
+
+            # The merged file is in place and catalogued before any daily file goes away.
+            path = os.path.join(self.root, target)
+            pq.write_table(table, f"{path}.tmp", compression=PARQUET_COMPRESSION)
+            os.replace(f"{path}.tmp", path)
+            self.partitions[target] = {'market': market, 'start': min(e['start'] for e in entries),
+                                       'end': max(e['end'] for e in entries), 'rows': table.num_rows,
+                                       'md5': file_md5(path), 'coverage': coverage}
+            old = [p for p in rel_paths if p != target]
+            self.forget(old)
+            self._set_coverage(market, coverage)
+            written.append(target)
+            replaced.extend(old)
+        self._save_catalog()
+        return written, replaced
+
+    def select(self, start=None, end=None, markets=None):
+        start = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        end = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+        return [
+            rel_path for rel_path, p in sorted(self.partitions.items())
+            if (start is None or p['end'] >= start)
+            and (end is None or p['start'] <= end)
+            and (markets is None or p['market'] in markets)
+        ]
+
+    def read(self, columns=None, start=None, end=None, markets=None):
+        paths = [os.path.join(self.root, p) for p in self.select(start, end, markets)]
+        if not paths:
+            return pd.DataFrame(columns=columns)
+
+        schema = pa.unify_schemas([pq.read_schema(p) for p in paths], promote_options='permissive')
+        dataset = ds.dataset(paths, schema=schema, format='parquet')
+        date_field = ds.field(self.date_col)
+        condition = None
+        if start is not None:
+            condition = date_field >= pa.scalar(pd.Timestamp(start).date(), type=pa.date32())
+        if end is not None:
+            upper = date_field <= pa.scalar(pd.Timestamp(end).date(), type=pa.date32())
+            condition = upper if condition is None else condition & upper
+        return to_frame(dataset.to_table(columns=columns, filter=condition))
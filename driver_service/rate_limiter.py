@@ -0,0 +1,46 @@
+import re
+import time
+import threading
+
+# SmartAPI historical candle endpoint: 3 requests / second (180 / minute).
+SMARTAPI_CANDLE_RATE = 3
+
+THROTTLE_PATTERN = re.compile(r'access rate|too many requests|rate limit', re.IGNORECASE)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens=1):
+        # Waiters queue on the lock, so calls are granted in arrival order.
+        with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                self.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+def candle_rate_limiter():
+    # No burst allowance: evenly spaced calls never put 4 requests in one server-side second.
+    return TokenBucket(SMARTAPI_CANDLE_RATE, capacity=1)
+
+
+def is_throttled(result):
+    if isinstance(result, dict):
+        if result.get('status', True):
+            return False
+        result = result.get('message', '')
+    return bool(THROTTLE_PATTERN.search(str(result)))
@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+ALL_STOCK_COLUMNS = ['Name', 'BSE Code', 'NSE Code', 'Industry', 'Current Price', 'Market Capitalization']
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# The security universe and its lookup sheets, parsed once and kept as
+# uncompressed Feather (Arrow IPC) snapshots that later runs memory-map instead
+# of re-reading the CSV/Excel sources. Each snapshot records its sources' mtime,
+# size and sha1; a changed size or hash rebuilds it, a touched-but-identical
+# file only refreshes the recorded mtime.
+class ReferenceData:
+    def __init__(self, snapshot_dir, all_stock_path=None, mapping_sheet_path=None,
+                 sub_industry_path=None, marketcap_path=None):
+        self.snapshot_dir = snapshot_dir
+        self.all_stock_path = all_stock_path
+        self.mapping_sheet_path = mapping_sheet_path
+        self.sub_industry_path = sub_industry_path
+        self.marketcap_path = marketcap_path
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    # ---------- snapshots ----------
+    def universe(self):
+        # all-stocks joined with the industry -> sector mapping sheet
+        return self._snapshot('universe', [self.all_stock_path, self.mapping_sheet_path], lambda: pd.merge(
+            pd.read_csv(self.all_stock_path)[ALL_STOCK_COLUMNS], self.sector_map(), on=['Industry'], how='left'))
+
+    def sector_map(self):
+        return self._snapshot('sector_map', [self.mapping_sheet_path],
+                              lambda: pd.read_excel(self.mapping_sheet_path))
+
+    def sub_industry(self):
+        return self._snapshot('sub_industry', [self.sub_industry_path],
+                              lambda: pd.read_csv(self.sub_industry_path))
+
+    def market_cap(self):
+        return self._snapshot('market_cap', [self.marketcap_path],
+                              lambda: pd.read_csv(self.marketcap_path))
+
+    # ---------- plumbing ----------
+    def _paths(self, name):
+        base = os.path.join(self.snapshot_dir, name)
+        return f"{base}.feather", f"{base}.json"
+
+    def _fingerprint(self, sources, recorded):
+        # Hash only the files whose stat changed since the snapshot was taken.
+        fingerprint = {}
+        for path in sources:
+            stat = os.stat(path)
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+            old = recorded.get(path)
+            if old and old['mtime_ns'] == entry['mtime_ns'] and old['size'] == entry['size']:
+                entry['sha1'] = old['sha1']
+            else:
+                entry['sha1'] = file_sha1(path)
+            fingerprint[path] = entry
+        return fingerprint
+
+    def _snapshot(self, name, sources, build):
+        if any(path is None for path in sources):
+            raise ValueError(f"Reference snapshot {name!r} needs every source path, got {sources}")
+        data_path, meta_path = self._paths(name)
+        recorded = {}
+        if os.path.exists(meta_path) and os.path.exists(data_path):
+            with open(meta_path) as f:
+                recorded = json.load(f)['sources']
+
+        fingerprint = self._fingerprint(sources, recorded)
+        fresh = set(recorded) == set(fingerprint) and all(
+            recorded[p]['sha1'] == e['sha1'] and recorded[p]['size'] == e['size'] for p, e in fingerprint.items())
+        if fresh:
+            if recorded != fingerprint:
+                self._write_meta(meta_path, fingerprint)
+            return feather.read_table(data_path, memory_map=True).to_pandas()
+
+        df = build()
+        try:
+            feather.write_feather(df, f"{data_path}.tmp", compression='uncompressed')
+        except (pa.ArrowException, ValueError):
+            # Mixed-type object columns can't be stored columnar; serve this run uncached.
+            return df
+        os.replace(f"{data_path}.tmp", data_path)
+        self._write_meta(meta_path, fingerprint)
+        return df
+
+    @staticmethod
+    def _write_meta(meta_path, fingerprint):
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({'sources': fingerprint}, f, indent=1)
+        os.replace(f"{meta_path}.tmp", meta_path)
@@ -0,0 +1,94 @@
+import pandas as pd
+import pyarrow as pa
+
+SCHEMA_VERSION = 1
+
+# Canonical in-memory / on-disk types for the daily OHLCV panel. Stored files use
+# date32 trade dates, float32 prices, int64 volumes and dictionary-encoded
+# dimensions; in pandas these come back as datetime64, float32, Int64 and category.
+# Volume is nullable: a missing volume stays <NA> instead of posing as a 0-volume bar.
+DATE_COLUMN = 'date'
+SYMBOL_COLUMN = 'NSE_BSE_code'
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+VOLUME_COLUMNS = ['volume']
+CATEGORY_COLUMNS = ['Name', 'Industry', 'Mapped Sector', 'Sector', 'Category', 'Sub Industry', 'market', 'Market']
+# Per-row ISO timestamp the trade date used to be parsed from; dropped once `date` exists.
+LEGACY_TIMESTAMP_COLUMN = 'datetime'
+
+ARROW_TYPES = {
+    DATE_COLUMN: pa.date32(),
+    SYMBOL_COLUMN: pa.string(),
+    **{col: pa.float32() for col in PRICE_COLUMNS},
+    **{col: pa.int64() for col in VOLUME_COLUMNS},
+    **{col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS},
+}
+
+
+def trade_dates(values):
+    # 'YYYY-MM-DD...' strings (ISO timestamps included), dates or timestamps -> midnight datetime64.
+    values = pd.Series(values)
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        return pd.to_datetime(values.astype(str).str[:10], format='%Y-%m-%d')
+    values = pd.to_datetime(values)
+    if values.dt.tz is not None:
+        values = values.dt.tz_localize(None)
+    return values.dt.normalize()
+
+
+def conform(df):
+    # Returns a copy of df with every known panel column cast to its canonical type.
+    # Unknown columns pass through; mixed int/str object columns become str.
+    df = df.copy()
+    if DATE_COLUMN not in df.columns and LEGACY_TIMESTAMP_COLUMN in df.columns:
+        df[DATE_COLUMN] = trade_dates(df[LEGACY_TIMESTAMP_COLUMN])
+    df = df.drop(columns=[LEGACY_TIMESTAMP_COLUMN], errors='ignore')
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = trade_dates(df[DATE_COLUMN])
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    for col in VOLUME_COLUMNS:
+        if col in df.columns:
+            volume = pd.to_numeric(df[col], errors='coerce')
+            missing = int(volume.isna().sum())
+            if missing:
+                print(f"⚠️ {missing} of {len(volume)} rows have no {col}; kept as missing, not 0")
+            df[col] = volume.round().astype('Int64')
+    if SYMBOL_COLUMN in df.columns:
+        df[SYMBOL_COLUMN] = df[SYMBOL_COLUMN].where(df[SYMBOL_COLUMN].isna(), df[SYMBOL_COLUMN].astype(str))
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def arrow_schema(df):
+    # Arrow schema for a conformed frame: canonical types where known, inferred otherwise.
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([pa.field(f.name, ARROW_TYPES.get(f.name, f.type)) for f in inferred],
+                     metadata=inferred.metadata)
+
+
+def to_table(df):
+    df = conform(df)
+    return pa.Table.from_pandas(df, schema=arrow_schema(df), preserve_index=False)
+
+
+def to_frame(table):
+    # date32 -> datetime64 rather than Python date objects; dictionaries -> category;
+    # volumes -> nullable Int64 whether or not this table has nulls.
+    df = table.to_pandas(date_as_object=False)
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = df[DATE_COLUMN].astype('datetime64[ns]')
+    for col in VOLUME_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('Int64')
+    return df
+
+
+def is_canonical(schema):
+    return all(schema.field(name).type == arrow_type
+               for name, arrow_type in ARROW_TYPES.items() if name in schema.names) \
+        and LEGACY_TIMESTAMP_COLUMN not in schema.names
@@ -0,0 +1,163 @@
+import os
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Screener category -> chartink page, in the order fetch_data has always concatenated them.
+CHARTINK_SCREENERS = {
+    'volatility-compression': "https://chartink.com/screener/volatility-compression",
+    'mark-minervini-vcp-pattern': "https://chartink.com/screener/mark-minervini-vcp-pattern",
+    'stockexploder_vcp': "https://chartink.com/screener/stockexploder-vcp-2",
+    'rocket_based': "https://chartink.com/screener/rb-stockexploder",
+}
+RESULTS_TABLE_ID = 'DataTables_Table_0'
+
+# Returns null until the results table has rows (chartink fills it after an XHR),
+# then the header and cell texts of every row. A DataTables-managed table is first
+# switched to a single page so rows beyond the first page are in the DOM too.
+READ_TABLE_JS = """
+var table = document.getElementById(arguments[0]);
+if (!table || !table.tHead || !table.tBodies.length || !table.tBodies[0].rows.length) { return null; }
+if (window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable(table)) {
+    var api = jQuery(table).DataTable();
+    if (api.page.len() !== -1) { api.page.len(-1).draw(false); }
+}
+var text = function (cell) { return cell.innerText.trim(); };
+return {
+    header: Array.prototype.map.call(table.tHead.rows[0].cells, text),
+    rows: Array.prototype.map.call(table.tBodies[0].rows, function (row) {
+        return Array.prototype.map.call(row.cells, text);
+    })
+};
+"""
+
+
+def chrome_driver():
+    # Headless Chrome using the chromedriver shipped next to this package.
+    chromedriver_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drivers', 'chromedriver.exe')
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    service = Service(executable_path=chromedriver_path) if os.path.exists(chromedriver_path) else Service()
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+# Up to `size` browsers, started on first use and handed out one caller at a time.
+# A browser stays warm between pages. One that raised while in use (or failed to
+# start) gives its slot back, so a waiting caller launches a fresh browser instead
+# of reusing a broken one or waiting forever. close() (or leaving the `with` block)
+# quits every browser the pool started, including ones still checked out.
+class BrowserPool:
+    def __init__(self, size=4, driver_factory=chrome_driver):
+        self.size = size
+        self.driver_factory = driver_factory
+        self._idle = []
+        self._started = []
+        self._slots = 0  # browsers started or being launched
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _checkout(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("BrowserPool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._slots < self.size:
+                    self._slots += 1
+                    break
+                self._cond.wait()
+        try:
+            driver = self.driver_factory()
+        except BaseException:
+            with self._cond:
+                self._slots -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            if not self._closed:
+                self._started.append(driver)
+                return driver
+        self._quit(driver)
+        raise RuntimeError("BrowserPool is closed")
+
+    def _checkin(self, driver):
+        with self._cond:
+            if driver in self._started:
+                self._idle.append(driver)
+                self._cond.notify()
+
+    def _discard(self, driver):
+        with self._cond:
+            if driver not in self._started:
+                return
+            self._started.remove(driver)
+            self._slots -= 1
+            self._cond.notify()
+        self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"⚠️ Failed to quit browser: {e}")
+
+    @contextmanager
+    def browser(self):
+        driver = self._checkout()
+        try:
+            yield driver
+        except BaseException:
+            self._discard(driver)
+            raise
+        self._checkin(driver)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            drivers, self._started, self._idle = self._started, [], []
+            self._cond.notify_all()
+        for driver in drivers:
+            self._quit(driver)
+
+
+# Reads chartink screener results straight from the rendered results table; no
+# clipboard involved, so several screeners can run at once on one pool.
+class ChartinkScraper:
+    def __init__(self, pool, table_id=RESULTS_TABLE_ID, timeout=30):
+        self.pool = pool
+        self.table_id = table_id
+        self.timeout = timeout
+
+    def fetch(self, url):
+        with self.pool.browser() as driver:
+            driver.get(url)
+            table = WebDriverWait(driver, self.timeout).until(
+                lambda d: d.execute_script(READ_TABLE_JS, self.table_id))
+
+        # "No stocks filtered" comes back as a single spanning cell, not a result row.
+        rows = [row for row in table['rows'] if len(row) == len(table['header'])]
+        df = pd.DataFrame(rows, columns=table['header'], dtype=object)
+        # Same cleanup the clipboard copy had: thousands separators stripped, values kept as text.
+        return df.replace(",", "", regex=True)
+
+    def fetch_all(self, screeners=CHARTINK_SCREENERS):
+        # {category: url} -> {category: DataFrame}, one worker per pooled browser.
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = {category: executor.submit(self.fetch, url) for category, url in screeners.items()}
+            return {category: future.result() for category, future in futures.items()}
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from datetime import datetime
+from driver_service.file_formats import PARQUET_COMPRESSION
+from driver_service.ohlcv_store import file_md5
+from driver_service.schema import to_frame
+
+CATALOG_FILE = '_catalog.json'
+SCREEN_COLUMN = 'category'
+SYMBOL_COLUMN = 'Symbol'
+NUMERIC_COLUMNS = ['Price', '% Chg']
+# Columns every archived day carries (vcp.fetch_data output); an empty read still has them.
+SCREEN_COLUMNS = ['date', SCREEN_COLUMN, 'Industry', SYMBOL_COLUMN, 'Stock Name', 'Price', 'Category', 'Sub Industry']
+# Daily VCP uploads from before the archive: <ddmmyyyy>.csv
+LEGACY_DAILY_NAME = re.compile(r'^(\d{8})\.csv$')
+
+
+# Every day's chartink screener results in one columnar archive:
+#   root/<YYYY-MM-DD>.parquet   rows keyed by (date, category, Symbol)
+# `_catalog.json` lists each day's file with its md5 and per-screen counts, and
+# keeps a per-symbol first/last-seen index so "since when" questions and the
+# latest available day are answered without opening any file.
+class ScreenerArchive:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, CATALOG_FILE)
+        self.catalog = {'partitions': {}, 'symbols': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.catalog = json.load(f)
+
+    def _save_catalog(self):
+        path = os.path.join(self.root, CATALOG_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(self.catalog, f, indent=1, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def partitions(self):
+        return self.catalog['partitions']
+
+    def is_empty(self):
+        return not self.partitions
+
+    # ---------- writes ----------
+    def append(self, df, day):
+        # Stores (or replaces) one day's screener output; duplicate (category, Symbol)
+        # rows keep the last one. Returns the rel path written.
+        day = pd.Timestamp(day).strftime('%Y-%m-%d')
+        df = df.drop_duplicates([SCREEN_COLUMN, SYMBOL_COLUMN], keep='last').copy()
+        # Fixed types whatever the source (scraped text or re-read CSV), so every day's file unifies.
+        for col in df.columns:
+            if col in NUMERIC_COLUMNS:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+            else:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(object)
+        df[SCREEN_COLUMN] = df[SCREEN_COLUMN].astype('category')
+        df.insert(0, 'date', pd.Timestamp(day))
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.set_column(0, pa.field('date', pa.date32()), table.column('date').cast(pa.date32()))
+        rel_path = f"{day}.parquet"
+        path = os.path.join(self.root, rel_path)
+        pq.write_table(table, f"{path}.tmp", compression=PARQUET_COMPRESSION)
+        os.replace(f"{path}.tmp", path)
+
+        replaced = rel_path in self.partitions
+        self.partitions[rel_path] = {'date': day, 'rows': len(df), 'md5': file_md5(path),
+                                     'screens': {str(k): int(v) for k, v in df[SCREEN_COLUMN].value_counts().items()}}
+        if replaced:
+            self.rebuild_symbol_index()
+        else:
+            self._index_symbols(day, df[SYMBOL_COLUMN])
+        self._save_catalog()
+        return rel_path
+
+    def _index_symbols(self, day, symbols):
+        index = self.catalog['symbols']
+        for symbol in pd.unique(symbols.dropna()):
+            seen = index.setdefault(str(symbol), {'first': day, 'last': day})
+            seen['first'] = min(seen['first'], day)
+            seen['last'] = max(seen['last'], day)
+
+    def rebuild_symbol_index(self):
+        self.catalog['symbols'] = {}
+        for rel_path, entry in sorted(self.partitions.items()):
+            symbols = pq.read_table(os.path.join(self.root, rel_path), columns=[SYMBOL_COLUMN]).column(0)
+            self._index_symbols(entry['date'], symbols.to_pandas())
+
+    def register(self, partitions):
+        # Adds day files placed under root by a Drive download; None means removed upstream.
+        # New days only extend the symbol index; replaced or removed days need a rebuild.
+        if not partitions:
+            return
+        rebuild = False
+        for rel_path, entry in partitions.items():
+            rebuild |= rel_path in self.partitions
+            if entry is None:
+                self.partitions.pop(rel_path, None)
+                if os.path.exists(os.path.join(self.root, rel_path)):
+                    os.remove(os.path.join(self.root, rel_path))
+            else:
+                self.partitions[rel_path] = entry
+        if rebuild:
+            self.rebuild_symbol_index()
+        else:
+            for rel_path, entry in sorted(partitions.items()):
+                symbols = pq.read_table(os.path.join(self.root, rel_path), columns=[SYMBOL_COLUMN]).column(0)
+                self._index_symbols(entry['date'], symbols.to_pandas())
+        self._save_catalog()
+
+    def backfill(self, manager, folder_id):
+        # Imports the legacy <ddmmyyyy>.csv uploads that are not archived yet.
+        added = []
+        for file in manager.list_files_in_folder(folder_id):
+            match = LEGACY_DAILY_NAME.match(file['name'])
+            if not match:
+                continue
+            day = datetime.strptime(match.group(1), '%d%m%Y').strftime('%Y-%m-%d')
+            if f"{day}.parquet" in self.partitions:
+                continue
+            df = manager.fetch_csv_by_name_as_dataframe(file['name'], folder_id)
+            if df is None:
+                print(f"⚠️ Skipping unreadable screener upload {file['name']}")
+                continue
+            added.append(self.append(df, day))
+        return added
+
+    # ---------- queries ----------
+    def latest_date(self):
+        return max((entry['date'] for entry in self.partitions.values()), default=None)
+
+    def read(self, start=None, end=None, categories=None, symbols=None, columns=None):
+        start = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        end = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+        paths = [os.path.join(self.root, rel_path) for rel_path, entry in sorted(self.partitions.items())
+                 if (start is None or entry['date'] >= start) and (end is None or entry['date'] <= end)]
+        if not paths:
+            return pd.DataFrame(columns=columns or SCREEN_COLUMNS)
+
+        schema = pa.unify_schemas([pq.read_schema(p) for p in paths], promote_options='permissive')
+        condition = None
+        for col, values in ((SCREEN_COLUMN, categories), (SYMBOL_COLUMN, symbols)):
+            if values is not None:
+                clause = ds.field(col).isin(list(values))
+                condition = clause if condition is None else condition & clause
+        return to_frame(ds.dataset(paths, schema=schema, format='parquet').to_table(columns=columns, filter=condition))
+
+    def latest(self):
+        # The most recent archived day, whether or not the screeners ran today.
+        day = self.latest_date()
+        return self.read(start=day, end=day) if day is not None else self.read()
+
+    def symbols_on_screens(self, min_screens=3, start=None, end=None):
+        # Symbols seen on at least min_screens distinct screeners within [start, end];
+        # defaults to the week (Mon-Sun) of the latest archived day.
+        if start is None and end is None and self.latest_date() is not None:
+            latest = pd.Timestamp(self.latest_date())
+            start, end = latest - pd.Timedelta(days=latest.weekday()), latest
+        hits = self.read(start=start, end=end, columns=['date', SCREEN_COLUMN, SYMBOL_COLUMN])
+        if hits.empty:
+            return pd.DataFrame(columns=[SYMBOL_COLUMN, 'screens', 'days'])
+        counts = hits.groupby(SYMBOL_COLUMN).agg(screens=(SCREEN_COLUMN, 'nunique'), days=('date', 'nunique'))
+        counts = counts[counts['screens'] >= min_screens]
+        return counts.sort_values(['screens', 'days'], ascending=False).reset_index()
+
+    def first_appearance(self, symbols=None):
+        # Symbol -> first archived date it appeared on any screener, from the catalog index.
+        index = self.catalog['symbols']
+        keys = index.keys() if symbols is None else [str(s) for s in symbols]
+        return pd.Series({s: pd.Timestamp(index[s]['first']) if s in index else pd.NaT for s in keys},
+                         name='first_seen', dtype='datetime64[ns]')
@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Offline stand-in for SmartApi.SmartConnect: deterministic daily candles per token,
+# `latency` seconds per call and SmartAPI's throttling error once more than
+# `rate_limit` candle requests land inside one second.
+class StubSmartConnect:
+    def __init__(self, api_key=None, latency=0.05, rate_limit=3):
+        self.api_key = api_key
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.calls = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def generateSession(self, client_code, password, totp):
+        return {'status': True, 'data': {'jwtToken': 'stub', 'refreshToken': 'stub', 'feedToken': 'stub'}}
+
+    def getProfile(self, refresh_token):
+        return {'status': True, 'data': {'clientcode': 'STUB'}}
+
+    def _admit(self):
+        with self._lock:
+            now = time.monotonic()
+            self.calls += 1
+            while self._recent and now - self._recent[0] >= 1:
+                self._recent.popleft()
+            if self.rate_limit and len(self._recent) >= self.rate_limit:
+                self.throttled += 1
+                return False
+            self._recent.append(now)
+            return True
+
+    def getCandleData(self, historic_param):
+        admitted = self._admit()
+        time.sleep(self.latency)
+        if not admitted:
+            return {'status': False, 'message': 'Access denied because of exceeding access rate',
+                    'errorcode': 'AB1004', 'data': None}
+
+        days = pd.bdate_range(historic_param['fromdate'][:10], historic_param['todate'][:10])
+        rng = np.random.default_rng(int(historic_param['symboltoken']))
+        close = 100 + rng.standard_normal(len(days)).cumsum()
+        candles = [
+            [f"{day:%Y-%m-%d}T00:00:00+05:30", round(c - 0.5, 2), round(c + 1, 2), round(c - 1, 2), round(c, 2),
+             int(v)]
+            for day, c, v in zip(days, close, rng.integers(1_000, 100_000, len(days)))
+        ]
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': candles}
+
+
+def stub_token_master(n_symbols):
+    tokens = [str(1000 + i) for i in range(n_symbols)]
+    names = [f"SYM{i}" for i in range(n_symbols)]
+    nse = pd.DataFrame({'token': tokens, 'name': names, 'exch_seg': 'NSE'})
+    bse = pd.DataFrame({'token': [str(500000 + i) for i in range(n_symbols)], 'name': names, 'exch_seg': 'BSE'})
+    return pd.concat([bse, nse], ignore_index=True)
+
+
+def stub_universe(n_symbols):
+    return pd.DataFrame({
+        'Name': [f"Stock {i}" for i in range(n_symbols)],
+        'NSE_BSE_code': [f"SYM{i}" for i in range(n_symbols)],
+        'Industry': [f"Industry {i % 20}" for i in range(n_symbols)],
+        'Mapped Sector': [f"Sector {i % 5}" for i in range(n_symbols)],
+        'Category': np.where(np.arange(n_symbols) < 100, 'Large-cap', 'Small-cap'),
+        'Market Capitalization': np.linspace(100000, 10, n_symbols),
+    })
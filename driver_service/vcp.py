@@ -58,8 +58,11 @@ import mysql.connector
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from sqlalchemy import create_engine
-import pyperclip
 from datetime import date
+from driver_service.reference_data import ReferenceData
+from driver_service.screener import BrowserPool, ChartinkScraper, CHARTINK_SCREENERS
+from driver_service.constant import (REFERENCE_SNAPSHOT_DIR, ALL_STOCK_PATH, INDUSTRY_SECTOR_MAP_PATH,
+                                     SUB_INDUSTRY_MAP_PATH, MARKETCAP_PATH, SCREENER_BROWSERS)
 
 today = date.today().strftime("%Y%m%d")
 
@@ -68,56 +71,21 @@ today = date.today().strftime("%Y%m%d")
 
 
 def vcp_data(url):
-
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    CHROMEDRIVER_PATH = os.path.join(BASE_DIR, 'drivers', 'chromedriver.exe')
-
-    # Debugging: print path to confirm
-    print(f"Using chromedriver at: {CHROMEDRIVER_PATH}")
-    chrome_options = Options()
-
-    # chrome_options.add_argument("--headless")  # Optional: remove if you want GUI
-    # chrome_options.add_argument("--window-size=1920,1080")
-    # chrome_options.add_argument("--no-sandbox")
-    # chrome_options.add_argument("--disable-dev-shm-usage")
-
-    service = Service(executable_path=CHROMEDRIVER_PATH)
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    # driver = webdriver.Chrome(service=service, options=options)
-    driver.get(url)
-    copy=WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//*[@id='DataTables_Table_0_wrapper']/div[1]/div/button[2]"))).click()
-
-
-    copied_data = pyperclip.paste()
-    # print("Copied Data:", copied_data)
-    data = copied_data.replace(",", "")
-    import io
-    # Load data into a pandas DataFrame
-    df = pd.read_csv(io.StringIO(data), sep="\t")
-    df
-    df=df.reset_index()
-    print(df)
-    df=df.drop(columns=['level_0'])
-    df.columns=df.iloc[0].to_list()
-    df=df.iloc[1:,:]
-    return df
+    # One screener on its own short-lived browser; fetch_data shares a pool across all of them.
+    with BrowserPool(size=1) as pool:
+        return ChartinkScraper(pool).fetch(url)
 
 def fetch_data():
 
     # https://chartink.com/screener/rb-stockexploder
-    data1=vcp_data("https://chartink.com/screener/volatility-compression")
-    data2=vcp_data("https://chartink.com/screener/mark-minervini-vcp-pattern")
-    data3 = vcp_data("https://chartink.com/screener/stockexploder-vcp-2")
-    datarb= vcp_data("https://chartink.com/screener/rb-stockexploder")
-    data3['category'] = 'stockexploder_vcp'
-    data2['category'] = 'mark-minervini-vcp-pattern'
-
-    data1['category'] = 'volatility-compression'
-    datarb['category'] = 'rocket_based'
+    with BrowserPool(size=SCREENER_BROWSERS) as pool:
+        screens = ChartinkScraper(pool).fetch_all(CHARTINK_SCREENERS)
 
-    data=pd.concat([data1,data2,data3,datarb])
+    data=pd.concat([df.assign(category=category) for category, df in screens.items()])
 
-    df_sector = pd.read_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\all-stocks (2).csv")
+    reference = ReferenceData(REFERENCE_SNAPSHOT_DIR, ALL_STOCK_PATH, INDUSTRY_SECTOR_MAP_PATH,
+                              SUB_INDUSTRY_MAP_PATH, MARKETCAP_PATH)
+    df_sector = reference.universe()
 
     df_final=pd.merge(data,df_sector[['NSE Code','Industry']],left_on=['Symbol'],right_on=['NSE Code'], how='left')
 
@@ -125,14 +93,14 @@ def fetch_data():
     df_final['% Chg']=df_final['% Chg'].astype(float)
 
 
-    df_sub_industry = pd.read_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\sub_industry_mapping.csv")
-    indus_sec_map =pd.read_excel(rf"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\map_indus_sector.xlsx")
+    df_sub_industry = reference.sub_industry()
+    indus_sec_map = reference.sector_map()
     df_map1=df_final.groupby(['category','Industry','Symbol','Stock Name','Price']).count().reset_index()[['category','Industry','Symbol','Stock Name','Price']]
     df_final_output =pd.merge(df_map1,indus_sec_map, on=['Industry'], how='left')
 
 
 
-    df_cap=pd.read_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\marketcap.csv")
+    df_cap = reference.market_cap()
 
     df_final_output=pd.merge(df_final_output,df_cap[['NSE Code','Category']], right_on=['NSE Code'],left_on=['Symbol'], how='left')
     df_final_output
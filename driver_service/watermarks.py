@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+# Per-symbol high-water mark: the trade date of the newest candle already held
+# locally, so the next run only asks Angel One for the bars after it. Marks are
+# derived from the OHLCV store itself (from_store), so they can never get ahead
+# of the candles that were actually saved. They are read-only: they advance when
+# the store does (server.py's bhavcopy upsert), not from what a fetch returned.
+class CandleWatermarks:
+    def __init__(self, marks=None):
+        self.marks = dict(marks or {})
+
+    @classmethod
+    def from_store(cls, store):
+        df = store.read(columns=[store.symbol_col, store.date_col])
+        if df.empty:
+            return cls()
+        latest = df.groupby(df[store.symbol_col].astype(str))[store.date_col].max()
+        return cls({code: day.strftime('%Y-%m-%d') for code, day in latest.items() if not pd.isna(day)})
+
+    def window_start(self, code, from_date, to_date):
+        # None means the symbol already has every trading day up to to_date.
+        last = self.marks.get(str(code))
+        if last is None:
+            return from_date
+        next_day = np.busday_offset(np.datetime64(last, 'D'), 1, roll='forward')
+        if next_day > np.datetime64(to_date[:10], 'D'):
+            return None
+        return max(f"{next_day} 09:15", from_date)
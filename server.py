@@ -16,6 +16,11 @@ from driver_service.constant import *
 from driver_service.driver_manager import DriveManager
 from driver_service.auth import create_service
 from driver_service.bhavcopy_data import BhavcopyDownloader
+from driver_service.ohlcv_store import OHLCVStore
+from driver_service.drive_cache import DriveCache, DriveMetadataCache
+from driver_service.reference_data import ReferenceData
+from driver_service.screener_archive import ScreenerArchive
+from driver_service.job_runner import report_stage, report_updated
 
 
 CLIENT_SECRET_FILE = os.path.join(project_root, "config", "client_secret.json")
@@ -23,105 +28,103 @@ API_NAME = 'drive'
 API_VERSION = 'v3'
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+report_stage('sync')
 drive = create_service(CLIENT_SECRET_FILE, API_NAME, API_VERSION, SCOPES)
-manager = DriveManager(drive)
-
-folder_id = manager.get_or_create_folder('bhavcopy_stock_data')
-
-prev_data=manager.fetch_csv_by_name_as_dataframe('complete_data1.csv',folder_id)
+manager = DriveManager(drive, cache=DriveCache(DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_BYTES),
+                       metadata=DriveMetadataCache(DRIVE_METADATA_PATH))
+
+folders = manager.get_or_create_folders(['bhavcopy_stock_data', 'vcp_folder'] + ([DRIVE_ARCHIVE_FOLDER] if DRIVE_ARCHIVE_FOLDER else []))
+folder_id = folders['bhavcopy_stock_data']
+archive_folder_id = folders.get(DRIVE_ARCHIVE_FOLDER)
+
+store = OHLCVStore(OHLCV_STORE_DIR)
+synced = manager.download_partitions(folder_id, store.root, store.partitions)
+store.register(synced)
+# Republish partitions rewritten locally, e.g. legacy files migrated to the canonical schema
+manager.upload_partitions(store.root, store.partitions, folder_id)
+if store.is_empty():
+    # No partitions published yet: seed them once from the legacy monolithic CSV
+    store.append(manager.fetch_csv_by_name_as_dataframe('complete_data1.csv', folder_id))
+    manager.upload_partitions(store.root, store.partitions, folder_id)
+    synced = True
+if synced:
+    report_updated('panel')
+
+report_stage('retention')
+# Retention works on whole partitions: expired ones are retired (archived on Drive when
+# DRIVE_ARCHIVE_FOLDER is set) and the daily files of closed months are merged.
+retired = store.apply_retention(RETENTION_DAYS)
+manager.retire_partitions(retired, folder_id, archive_folder_id)
+compacted, replaced = store.compact()
+# One manifest write publishes the monthly files and retires the daily ones they replace
+manager.upload_partitions(store.root, {p: store.partitions[p] for p in compacted}, folder_id, replaces=replaced)
+if retired or compacted:
+    report_updated('panel')
+print("Drive cache:", manager.cache.stats())
 # Index(['NSE_BSE_code', 'open', 'close', 'low', 'high', 'volume', 'datetime',
 #        'market', 'Name', 'BSE Code', 'NSE Code', 'Industry', 'Current Price',
 #        'Market Capitalization', 'Mapped Sector', 'Category'],
 #       dtype='object')
 # df[(df['Industry']=="Petroleum Products") | (df['Industry']=="Agricultural Food & other Products")].to_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\test2.csv",index=False)
-prev_data[['date', 'time']] = prev_data['datetime'].str.split('T', expand=True)
-
-prev_data = prev_data[prev_data["Industry"] != "BhaPra"]
-#  ✅ Create temporary datetime series for sorting ONLY
-temp_dates = pd.to_datetime(prev_data['date'], format="%Y-%m-%d")
-
-# ✅ Group by original 'date' (string), use temp_dates for sorting
-date_counts = prev_data.groupby('date')['NSE_BSE_code'].nunique()
-date_counts = date_counts.loc[pd.Series(prev_data['date'].unique(), index=prev_data['date'].unique()).sort_values(ascending=False, key=lambda x: pd.to_datetime(x, format='%Y-%m-%d')).index]
-
-# ✅ Find last date with stock count >= 4000
-last_date = ""
-for date, count in date_counts.items():
-    if count >= 4000:
-        last_date = date  # already in string format: 'YYYY-MM-DD'
-        last_date = pd.to_datetime(last_date, format='%Y-%m-%d').strftime('%d-%m-%Y')
-
-        break
+# ✅ Last date with stock count >= 4000, kept up to date by the store's coverage manifest
+last_date = store.last_complete_date()
+if last_date is not None:
+    last_date = pd.to_datetime(last_date, format='%Y-%m-%d').strftime('%d-%m-%Y')
 else:
+    last_date = ""
     print("❗ No date found with stock count >= 4000")
 
 print("Last Date:", last_date)
-# Convert 'date' column to datetime
-prev_data['date'] = pd.to_datetime(prev_data['datetime'].str.split('T').str[0], format="%Y-%m-%d")
-
-# Set how many days to keep
-days_to_keep = 180 # You can change this as needed
-
-# Find max date and cutoff date
-max_date = prev_data['date'].max()
-cutoff_date = max_date - pd.Timedelta(days=days_to_keep)
-
-# Filter out data older than cutoff
-prev_data = prev_data[prev_data['date'] >= cutoff_date]
-print(prev_data['date'].min(), prev_data['date'].max())
-
-prev_data.drop(columns=['date', 'time'],inplace=True)
+print(store.retention_cutoff(RETENTION_DAYS), store.latest_date())
 
 if last_date != datetime.today().strftime('%d-%m-%Y'):
+    report_stage('bhavcopy')
     downloader = BhavcopyDownloader(
         download_dir=r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\Bhav_copy_data",
         all_stock_path=r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\all-stocks (2).csv",
-        mapping_sheet_path=r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\map_indus_sector.xlsx"
+        mapping_sheet_path=r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\map_indus_sector.xlsx",
+        backend=BHAVCOPY_BACKEND
     )
 
     # last_date = "01-06-2025"
     url = "https://www.samco.in/bhavcopy-nse-bse-mcx"
-    dfk = pd.read_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\sub_industry_mapping.csv")
+    dfk = ReferenceData(REFERENCE_SNAPSHOT_DIR, sub_industry_path=SUB_INDUSTRY_MAP_PATH).sub_industry()
 
     downloader.download_bhavcopy(url, last_date)
     df_bhavcopy = downloader.extract_bhavcopy(last_date)
     df_final_output = downloader.process_all_stock()
     today_data = downloader.merge_bhavcopy_with_mapping(df_bhavcopy, df_final_output)
     print("today_data",today_data.columns)
-    print("previous_data",prev_data.columns)
-    prev_data = prev_data[['NSE_BSE_code', 'open', 'close', 'low', 'high', 'volume', 'datetime',
-       'market', 'Name', 'BSE Code', 'NSE Code', 'Industry', 'Current Price',
-       'Market Capitalization', 'Mapped Sector', 'Category']]
-    final_data=pd.concat([prev_data,today_data])
-
-    final_data=pd.merge(final_data, dfk[['NSE_BSE_code', 'consumer_discretionary','Sub Industry']], on='NSE_BSE_code', how='left')
-    final_data['Sub Industry'] = final_data['Sub Industry'].fillna('BhaPra')
-    final_data.drop_duplicates(subset=["NSE_BSE_code",'datetime'],keep='last',inplace=True)
-    final_data.to_csv(r"D:\web Development using python\PROJECTS\Stocks\Fundamental Analysis\swing_trade\Data\final_data.csv",index=False)
-
-    manager.upload_dataframe_in_memory(final_data,'complete_data1.csv', folder_id)
+
+    today_data=pd.merge(today_data, dfk[['NSE_BSE_code', 'consumer_discretionary','Sub Industry']], on='NSE_BSE_code', how='left')
+    today_data['Sub Industry'] = today_data['Sub Industry'].fillna('BhaPra')
+    report_stage('ohlcv')
+    # Keyed on (NSE_BSE_code, trade date), last row wins; only the touched partitions are rewritten
+    upserted = store.upsert(today_data)
+    print(f"Upserted {upserted['inserted']} new and {upserted['updated']} updated rows")
+
+    manager.upload_partitions(store.root, {p: store.partitions[p] for p in upserted['written']}, folder_id)
     print("NSE BSE data uploaded successfully")
+    if upserted['written']:
+        report_updated('panel')
 
     ######################################### vcp data ######################################################
+    report_stage('screeners')
     # Call the function and upload the data
     vcp = fetch_data()
 
-    folder_id_vcp = manager.get_or_create_folder('vcp_folder')
+    folder_id_vcp = folders['vcp_folder']
 
-    manager.upload_dataframe_in_memory(vcp,f'{datetime.today().strftime("%d%m%Y")}.csv',folder_id_vcp)
-    print("Vcp uploaded successfully")
+    # Each day's screens go into one archive keyed by (date, category, Symbol)
+    screeners = ScreenerArchive(SCREENER_ARCHIVE_DIR)
+    screeners.register(manager.download_partitions(folder_id_vcp, screeners.root, screeners.partitions))
+    if screeners.is_empty():
+        screeners.backfill(manager, folder_id_vcp)
+    screeners.append(vcp, datetime.today())
+    manager.upload_partitions(screeners.root, screeners.partitions, folder_id_vcp)
+    print("Vcp archived successfully")
+    report_updated('screeners')
 
     # Do anything with the returned dataframe
 
-
-
-
-
-
-
-
-
-
-
-
-
+report_stage('done')
@@ -0,0 +1,147 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from driver_service.bhavcopy_data import read_bhavcopy_zip, OUTPUT_COLUMNS
+from driver_service.bhavcopy_http import HttpBhavcopyFetcher, IncompleteDownload
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'bhavcopy')
+NSE_CSV = 'BhavCopy_NSE_CM_0_0_0_20250102_F_0000.csv'
+BSE_CSV = 'BhavCopy_BSE_CM_0_0_0_20250102_F_0000.CSV'
+TRADE_DAY = datetime(2025, 1, 2)
+HOLIDAY = datetime(2025, 1, 3)
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def _zipped(name, data, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as z:
+        z.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _corrupt_zip():
+    # A stored (uncompressed) member with one payload byte flipped: the archive
+    # opens fine but fails its CRC check.
+    data = bytearray(_zipped(NSE_CSV, _fixture(NSE_CSV), zipfile.ZIP_STORED))
+    at = data.index(b'RELIANCE')
+    data[at] = ord('X')
+    return bytes(data)
+
+
+class _ArchiveHandler(BaseHTTPRequestHandler):
+    # Stands in for the exchange archives: path -> (status, body, extra headers).
+    routes = {}
+
+    def do_GET(self):
+        status, body, headers = self.routes.get(self.path, (404, b'not found', {}))
+        self.send_response(status)
+        headers = {'Content-Length': str(len(body)), **headers}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpBhavcopyFetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        _ArchiveHandler.routes = {
+            f'/nse/{TRADE_DAY:%Y%m%d}.csv.zip': (200, _zipped(NSE_CSV, _fixture(NSE_CSV)), {}),
+            f'/bse/{TRADE_DAY:%Y%m%d}.CSV': (200, _fixture(BSE_CSV), {}),
+            '/nse/corrupt.csv.zip': (200, _corrupt_zip(), {}),
+            '/nse/forbidden.csv.zip': (403, b'denied', {}),
+            '/nse/short.csv.zip': (200, b'PK\x03\x04', {'Content-Length': '4096'}),
+        }
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ArchiveHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.download_dir = tempfile.mkdtemp()
+        self.fetcher = self.make_fetcher('/nse/{day:%Y%m%d}.csv.zip', '/bse/{day:%Y%m%d}.CSV')
+
+    def tearDown(self):
+        self.fetcher.close()
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def make_fetcher(self, nse_path, bse_path):
+        return HttpBhavcopyFetcher(self.download_dir, nse_url_template=self.base_url + nse_path,
+                                   bse_url_template=self.base_url + bse_path, max_workers=2, timeout=5)
+
+    def test_udiff_maps_to_legacy_headers(self):
+        nse = self.fetcher.fetch('NSE', TRADE_DAY)
+        self.assertEqual(nse.splitlines()[0], 'SYMBOL,OPEN,HIGH,LOW,CLOSE,TOTTRDQTY')
+        self.assertEqual(nse.splitlines()[1], 'RELIANCE,1215.0,1240.5,1211.1,1238.65,6012345')
+        bse = self.fetcher.fetch('BSE', TRADE_DAY)
+        self.assertEqual(bse.splitlines()[0], 'SC_CODE,OPEN,HIGH,LOW,CLOSE,NO_OF_SHRS')
+        self.assertEqual(bse.splitlines()[1], '500325,1216.0,1240.0,1211.5,1238.4,234567')
+
+    def test_only_eq_series_one_row_per_symbol(self):
+        # The fixture also lists ZENTEC in BE and a RELIANCE block deal (BL).
+        symbols = [line.split(',')[0] for line in self.fetcher.fetch('NSE', TRADE_DAY).splitlines()[1:]]
+        self.assertEqual(symbols, ['RELIANCE', 'TCS'])
+
+    def test_unpublished_day_is_skipped(self):
+        self.assertIsNone(self.fetcher.fetch('NSE', HOLIDAY))
+        self.assertIsNone(self.fetcher.fetch('BSE', HOLIDAY))
+
+    def test_download_reads_like_the_samco_zip(self):
+        zip_path = self.fetcher.download_bhavcopy(TRADE_DAY.strftime('%d-%m-%Y'), to_date=HOLIDAY)
+        self.assertEqual(os.path.basename(zip_path), '2025-01-02-2025-01-03.zip')
+        with zipfile.ZipFile(zip_path) as z:
+            self.assertEqual(sorted(z.namelist()), ['20250102_BSE.csv', '20250102_NSE.csv'])
+
+        df = read_bhavcopy_zip(zip_path)
+        self.assertEqual(list(df.columns), OUTPUT_COLUMNS)
+        self.assertEqual(sorted(df['market'].unique()), ['BSE', 'NSE'])
+        self.assertTrue((df['date'] == TRADE_DAY).all())
+        nse = df[df['market'] == 'NSE'].set_index('NSE_BSE_code')
+        self.assertEqual(nse.loc['TCS', 'volume'], 1834567)
+        self.assertAlmostEqual(float(nse.loc['TCS', 'close']), 4101.55, places=2)
+        bse = df[df['market'] == 'BSE']
+        self.assertEqual(bse['NSE_BSE_code'].tolist(), [500325])
+
+    def test_corrupt_archive_is_rejected(self):
+        fetcher = self.make_fetcher('/nse/corrupt.csv.zip', '/bse/{day:%Y%m%d}.CSV')
+        with self.assertRaises(IncompleteDownload):
+            fetcher.fetch('NSE', TRADE_DAY)
+        fetcher.close()
+
+    def test_truncated_body_is_rejected(self):
+        # Fewer bytes than Content-Length announced; depending on the urllib3
+        # version the transport or the fetcher's own length check catches it.
+        fetcher = self.make_fetcher('/nse/short.csv.zip', '/bse/{day:%Y%m%d}.CSV')
+        with self.assertRaises((IncompleteDownload, requests.RequestException)):
+            fetcher.fetch('NSE', TRADE_DAY)
+        fetcher.close()
+
+    def test_http_error_is_raised(self):
+        fetcher = self.make_fetcher('/nse/forbidden.csv.zip', '/bse/{day:%Y%m%d}.CSV')
+        with self.assertRaises(requests.HTTPError):
+            fetcher.fetch('NSE', TRADE_DAY)
+        fetcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import os
+import time
+import shutil
+import threading
+import unittest
+import urllib.request
+from functools import partial
+from html.parser import HTMLParser
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from driver_service.screener import BrowserPool, ChartinkScraper, READ_TABLE_JS, RESULTS_TABLE_ID
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'chartink')
+
+
+class _TableParser(HTMLParser):
+    # Header and row cell texts of one table, the same shape READ_TABLE_JS returns.
+    def __init__(self, table_id):
+        super().__init__()
+        self.table_id = table_id
+        self.depth = 0
+        self.section = None
+        self.header, self.rows = [], []
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table' and (self.depth or dict(attrs).get('id') == self.table_id):
+            self.depth += 1
+        elif self.depth and tag in ('thead', 'tbody'):
+            self.section = tag
+        elif self.depth and tag == 'tr' and self.section == 'tbody':
+            self.rows.append([])
+        elif self.depth and tag in ('th', 'td'):
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'table' and self.depth:
+            self.depth -= 1
+        elif self.depth and tag in ('th', 'td') and self.cell is not None:
+            text = ''.join(self.cell).strip()
+            if self.section == 'thead' and not self.rows:
+                self.header.append(text)
+            elif self.rows:
+                self.rows[-1].append(text)
+            self.cell = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+class FakeDriver:
+    # Stands in for Chrome: loads pages from the fixture server and answers
+    # READ_TABLE_JS from the served HTML. The results table "renders" only after
+    # render_after polls, like chartink filling it in after its XHR.
+    def __init__(self, render_after=1, fail_urls=()):
+        self.render_after = render_after
+        self.fail_urls = fail_urls
+        self.html = None
+        self.polls = 0
+        self.pages = []
+        self.quit_called = False
+
+    def get(self, url):
+        if any(url.endswith(name) for name in self.fail_urls):
+            raise RuntimeError(f"renderer crashed on {url}")
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.html = response.read().decode('utf-8')
+        self.pages.append(url)
+        self.polls = 0
+
+    def execute_script(self, script, table_id):
+        assert script == READ_TABLE_JS
+        self.polls += 1
+        if self.polls <= self.render_after:
+            return None
+        parser = _TableParser(table_id)
+        parser.feed(self.html)
+        if not parser.rows:
+            return None
+        return {'header': parser.header, 'rows': parser.rows}
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FixtureServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        handler = partial(SimpleHTTPRequestHandler, directory=FIXTURES)
+        handler.log_message = lambda *args: None
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def url(self, name):
+        return f"{self.base_url}/{name}"
+
+
+class ChartinkScraperTest(FixtureServerTest):
+    def setUp(self):
+        self.drivers = []
+
+    def factory(self, **kwargs):
+        driver = FakeDriver(**kwargs)
+        self.drivers.append(driver)
+        return driver
+
+    def test_fetch_reads_rendered_table(self):
+        with BrowserPool(size=1, driver_factory=self.factory) as pool:
+            df = ChartinkScraper(pool, timeout=5).fetch(self.url('results.html'))
+        self.assertEqual(list(df.columns), ['Sr.', 'Stock Name', 'Symbol', 'Links', '% Chg', 'Price', 'Volume'])
+        self.assertEqual(df['Symbol'].tolist(), ['RELIANCE', 'TCS', 'INFY'])
+        # Thousands separators stripped, values left as text like the clipboard copy.
+        self.assertEqual(df['Price'].tolist(), ['2945.10', '4101.55', '1512.00'])
+        self.assertEqual(df['Volume'].iloc[0], '6012345')
+
+    def test_no_stocks_filtered_is_empty(self):
+        with BrowserPool(size=1, driver_factory=self.factory) as pool:
+            df = ChartinkScraper(pool, timeout=5).fetch(self.url('empty.html'))
+        self.assertTrue(df.empty)
+        self.assertIn('Symbol', df.columns)
+
+    def test_fetch_all_shares_warm_browsers_and_closes_them(self):
+        screeners = {f"screen-{i}": self.url('results.html' if i % 2 else 'empty.html') for i in range(4)}
+        with BrowserPool(size=2, driver_factory=self.factory) as pool:
+            frames = ChartinkScraper(pool, timeout=5).fetch_all(screeners)
+        self.assertEqual(list(frames), list(screeners))
+        self.assertEqual([len(df) for df in frames.values()], [0, 3, 0, 3])
+        self.assertLessEqual(len(self.drivers), 2)
+        self.assertEqual(sum(len(d.pages) for d in self.drivers), 4)
+        self.assertTrue(all(d.quit_called for d in self.drivers))
+
+    def test_failed_launch_frees_its_slot(self):
+        # One slot, two callers: the second waits while the first launch fails,
+        # then must get the slot and launch its own browser rather than wait forever.
+        launches = []
+
+        def flaky_factory():
+            launches.append(1)
+            if len(launches) == 1:
+                time.sleep(0.5)
+                raise RuntimeError("chromedriver failed to start")
+            return self.factory()
+
+        pool = BrowserPool(size=1, driver_factory=flaky_factory)
+        scraper = ChartinkScraper(pool, timeout=5)
+        results = []
+
+        def run():
+            try:
+                results.append(len(scraper.fetch(self.url('results.html'))))
+            except RuntimeError as e:
+                results.append(str(e))
+
+        workers = [threading.Thread(target=run, daemon=True) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+            time.sleep(0.1)
+        for worker in workers:
+            worker.join(timeout=10)
+        deadlocked = any(worker.is_alive() for worker in workers)
+        pool.close()
+        self.assertFalse(deadlocked, "pool deadlocked after a failed launch")
+        self.assertEqual(sorted(results, key=str), [3, "chromedriver failed to start"])
+
+    def test_broken_browser_is_replaced(self):
+        with BrowserPool(size=1, driver_factory=lambda: self.factory(fail_urls=('empty.html',))) as pool:
+            scraper = ChartinkScraper(pool, timeout=5)
+            with self.assertRaises(RuntimeError):
+                scraper.fetch(self.url('empty.html'))
+            self.assertEqual(len(scraper.fetch(self.url('results.html'))), 3)
+            self.assertEqual(len(self.drivers), 2)
+            self.assertTrue(self.drivers[0].quit_called)
+            self.assertFalse(self.drivers[1].quit_called)
+        self.assertTrue(self.drivers[1].quit_called)
+
+    def test_closed_pool_refuses_checkout(self):
+        pool = BrowserPool(size=1, driver_factory=self.factory)
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            ChartinkScraper(pool, timeout=5).fetch(self.url('results.html'))
+
+
+@unittest.skipUnless(shutil.which('chromedriver') or shutil.which('google-chrome') or shutil.which('chromium'),
+                     "needs a local Chrome")
+class ChromeScraperTest(FixtureServerTest):
+    # The real READ_TABLE_JS in headless Chrome against the same fixture pages.
+    def test_fetch_with_chrome(self):
+        with BrowserPool(size=1) as pool:
+            df = ChartinkScraper(pool, table_id=RESULTS_TABLE_ID, timeout=10).fetch(self.url('results.html'))
+        self.assertEqual(df['Symbol'].tolist(), ['RELIANCE', 'TCS', 'INFY'])
+
+
+if __name__ == '__main__':
+    unittest.main()